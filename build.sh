@@ -7,5 +7,5 @@ pip install -r requirements.txt
 # Collect static files
 python manage.py collectstatic --noinput
 
-# Run migrations
-python manage.py migrate --noinput
+# One-shot release tasks: migrations and moving images into the database
+python manage.py release
@@ -7,6 +7,7 @@ Generated by 'django-admin startproject' using Django 4.2.7.
 from pathlib import Path
 from decouple import config
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -72,6 +73,36 @@ except ImportError:
 except Exception:
     pass
 
+# ==================== CACHE ====================
+# Кеш общий для всех воркеров: Redis, если задан REDIS_URL (нужен пакет redis),
+# иначе файлы во временной папке
+if config('REDIS_URL', default=''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), 'constr_store_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Сколько живут закешированные страницы и фрагменты каталога (секунды).
+# Устаревание не зависит от этого срока: при изменениях каталога меняется версия ключей
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Идентификатор выкладки входит в ETag страниц, чтобы после деплоя браузеры
+# получили новую разметку. Render задает RENDER_GIT_COMMIT сам
+RELEASE_ID = config('RELEASE_ID', default=config('RENDER_GIT_COMMIT', default=''))
+
+# Сессии читаются из кеша, чтобы запрос из кеша страниц не ходил в базу
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # ==================== APPLICATION DEFINITION ====================
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -124,6 +155,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'shop.context_processors.shop_settings',
+                'shop.context_processors.catalog_cache',
             ],
         },
     },
@@ -253,4 +285,12 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO' if DEBUG else 'WARNING',
     },
+    'loggers': {
+        # Время старта воркеров нужно видеть и в production
+        'constr_store.startup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
\ No newline at end of file
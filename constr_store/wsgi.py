@@ -7,58 +7,43 @@ For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 """
 
+import logging
 import os
+import time
+
+_started = time.perf_counter()
+_timings = []
+
+
+def _mark(step):
+    """Запоминает момент окончания очередного этапа старта воркера"""
+    _timings.append((step, time.perf_counter()))
+
+
+def _log_startup():
+    """Пишет в лог, на что ушло время старта воркера"""
+    steps = []
+    previous = _started
+    for step, moment in _timings:
+        steps.append(f'{step} {(moment - previous) * 1000:.0f} мс')
+        previous = moment
+    logging.getLogger('constr_store.startup').info(
+        'Воркер запущен за %.0f мс (%s)', (previous - _started) * 1000, ', '.join(steps)
+    )
+
 
 from django.core.wsgi import get_wsgi_application
 from whitenoise import WhiteNoise
 
+_mark('импорт')
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'constr_store.settings')
 
-# Применяем миграции при старте
-if not os.environ.get('DJANGO_DEBUG'):
-    try:
-        import django
-        from django.core.management import execute_from_command_line
-        django.setup()
-        execute_from_command_line(['manage.py', 'migrate'])
-        print("✅ Миграции применены")
-    except Exception as e:
-        print(f"❌ Ошибка миграций: {e}")
-    
-    # Конвертируем существующие изображения в Base64
-    try:
-        from shop.models import Product, Category
-        import base64
-        
-        # Конвертируем товары
-        products = Product.objects.filter(image__isnull=False).exclude(image='').filter(image_data__isnull=True)
-        for product in products:
-            try:
-                if product.image and hasattr(product.image, 'path'):
-                    with open(product.image.path, 'rb') as f:
-                        image_data = f.read()
-                    product.image_data = base64.b64encode(image_data).decode('utf-8')
-                    product.save(update_fields=['image_data'])
-                    print(f"✅ Обновлено изображение товара: {product.name}")
-            except Exception as e:
-                print(f"⚠️ Ошибка товара {product.name}: {e}")
-        
-        # Конвертируем категории
-        categories = Category.objects.filter(image__isnull=False).exclude(image='').filter(image_data__isnull=True)
-        for category in categories:
-            try:
-                if category.image and hasattr(category.image, 'path'):
-                    with open(category.image.path, 'rb') as f:
-                        image_data = f.read()
-                    category.image_data = base64.b64encode(image_data).decode('utf-8')
-                    category.save(update_fields=['image_data'])
-                    print(f"✅ Обновлено изображение категории: {category.name}")
-            except Exception as e:
-                print(f"⚠️ Ошибка категории {category.name}: {e}")
-                
-        print("🎉 Конвертация изображений завершена!")
-    except Exception as e:
-        print(f"❌ Ошибка конвертации: {e}")
+# Миграции и перенос изображений в базу выполняет команда
+# `python manage.py release` один раз за деплой, а не каждый воркер при импорте.
+# Для хостингов без шага релиза есть RUN_RELEASE_ON_STARTUP=1: блокировка
+# внутри команды гарантирует, что задачи выполнит только один процесс, а
+# запись о выполненном RELEASE_ID - что их не повторят воркеры, стартовавшие позже.
 
 # Создаем media директорию при старте (без прав на /var/data)
 if not os.environ.get('DJANGO_DEBUG'):
@@ -71,6 +56,16 @@ if not os.environ.get('DJANGO_DEBUG'):
         os.makedirs(media_dir, exist_ok=True)
 
 application = get_wsgi_application()
+_mark('django')
+
+if os.environ.get('RUN_RELEASE_ON_STARTUP'):
+    from django.core.management import call_command
+    call_command('release')
+    _mark('release')
+
+# Индекс подсказок поиска живет в памяти воркера; собирается в фоне, старт его не ждет
+from shop.autocomplete import warm_up
+warm_up()
 
 # WhiteNoise для static файлов
 application = WhiteNoise(
@@ -79,6 +74,7 @@ application = WhiteNoise(
     prefix='/static/',
     autorefresh=True
 )
+_mark('whitenoise')
 
 # Добавляем media файлы
 if not os.environ.get('DJANGO_DEBUG'):
@@ -92,3 +88,6 @@ if not os.environ.get('DJANGO_DEBUG'):
 else:
     media_root = os.path.join(os.path.dirname(__file__), '..', 'media')
     application.add_files(media_root, prefix='/media/')
+_mark('media')
+
+_log_startup()
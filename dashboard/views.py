@@ -3,8 +3,10 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db.models import Sum, Count, Avg, F, Q
 from django.db.models.functions import TruncDay, TruncMonth, TruncYear
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta, datetime
 from shop.models import Order, OrderItem, Product
+from shop.pagination import CursorPaginator
 from django.http import JsonResponse, HttpResponse
 import json
 import pandas as pd
@@ -14,6 +16,13 @@ from io import BytesIO
 def is_admin(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
+def _parse_day(value):
+    """Дата из параметра запроса (ГГГГ-ММ-ДД) или None, если она некорректна"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
 @login_required
 @user_passes_test(is_admin)
 def dashboard_home(request):
@@ -34,16 +43,16 @@ def dashboard_home(request):
     avg_order_value = Order.objects.aggregate(avg=Avg('total_price'))['avg'] or 0
     
     # Показатели за сегодня
-    today_orders = Order.objects.filter(created_at__date=today).count()
-    today_revenue = Order.objects.filter(created_at__date=today).aggregate(total=Sum('total_price'))['total'] or 0
+    today_orders = Order.objects.created_on(today).count()
+    today_revenue = Order.objects.created_on(today).aggregate(total=Sum('total_price'))['total'] or 0
     
     # Показатели за последние 7 дней
-    week_orders = Order.objects.filter(created_at__date__gte=last_7_days).count()
-    week_revenue = Order.objects.filter(created_at__date__gte=last_7_days).aggregate(total=Sum('total_price'))['total'] or 0
+    week_orders = Order.objects.created_since(last_7_days).count()
+    week_revenue = Order.objects.created_since(last_7_days).aggregate(total=Sum('total_price'))['total'] or 0
     
     # Показатели за последние 30 дней
-    month_orders = Order.objects.filter(created_at__date__gte=last_30_days).count()
-    month_revenue = Order.objects.filter(created_at__date__gte=last_30_days).aggregate(total=Sum('total_price'))['total'] or 0
+    month_orders = Order.objects.created_since(last_30_days).count()
+    month_revenue = Order.objects.created_since(last_30_days).aggregate(total=Sum('total_price'))['total'] or 0
     
     # Топ товары
     top_products = OrderItem.objects.values(
@@ -60,8 +69,8 @@ def dashboard_home(request):
     sales_chart_data = []
     for i in range(30):
         date = today - timedelta(days=i)
-        daily_orders = Order.objects.filter(created_at__date=date).count()
-        daily_revenue = Order.objects.filter(created_at__date=date).aggregate(total=Sum('total_price'))['total'] or 0
+        daily_orders = Order.objects.created_on(date).count()
+        daily_revenue = Order.objects.created_on(date).aggregate(total=Sum('total_price'))['total'] or 0
         sales_chart_data.append({
             'date': date.strftime('%d.%m'),
             'orders': daily_orders,
@@ -81,9 +90,7 @@ def dashboard_home(request):
     ).order_by('-total')
     
     # Новые клиенты (за последние 30 дней)
-    new_customers = Order.objects.filter(
-        created_at__date__gte=last_30_days
-    ).values('user').distinct().count()
+    new_customers = Order.objects.created_since(last_30_days).values('user').distinct().count()
     
     # Постоянные клиенты (больше 1 заказа)
     returning_customers = Order.objects.values('user').annotate(
@@ -174,9 +181,7 @@ def dashboard_analytics(request):
         trunc_func = TruncDay
     
     # Продажи по дням/месяцам
-    sales_by_period = Order.objects.filter(
-        created_at__date__gte=start_date
-    ).annotate(
+    sales_by_period = Order.objects.created_since(start_date).annotate(
         period=trunc_func('created_at')
     ).values('period').annotate(
         orders=Count('id'),
@@ -192,9 +197,7 @@ def dashboard_analytics(request):
     ).order_by('-total_revenue')[:10]
     
     # Средний чек
-    avg_order_value = Order.objects.filter(
-        created_at__date__gte=start_date
-    ).aggregate(avg=Avg('total_price'))['avg'] or 0
+    avg_order_value = Order.objects.created_since(start_date).aggregate(avg=Avg('total_price'))['avg'] or 0
     
     context = {
         'period': period,
@@ -210,7 +213,7 @@ def dashboard_analytics(request):
 def dashboard_products(request):
     """Аналитика по товарам"""
     
-    products = Product.objects.annotate(
+    products = Product.objects.with_category().annotate(
         total_sold=Sum('orderitem__quantity'),
         total_revenue=Sum(F('orderitem__quantity') * F('orderitem__price'))
     ).order_by('-total_revenue')
@@ -246,18 +249,15 @@ def dashboard_orders(request):
         orders = orders.filter(status=status)
     
     date_from = request.GET.get('date_from', '')
-    if date_from:
-        orders = orders.filter(created_at__date__gte=date_from)
+    if _parse_day(date_from):
+        orders = orders.created_since(_parse_day(date_from))
     
     date_to = request.GET.get('date_to', '')
-    if date_to:
-        orders = orders.filter(created_at__date__lte=date_to)
+    if _parse_day(date_to):
+        orders = orders.created_until(_parse_day(date_to))
     
-    # Пагинация
-    from django.core.paginator import Paginator
-    paginator = Paginator(orders, 25)
-    page = request.GET.get('page')
-    orders = paginator.get_page(page)
+    # Пагинация по курсору: глубокие страницы не дороже первой
+    orders = CursorPaginator(orders, 25).get_page(request.GET.get('cursor'), request.GET)
     
     context = {
         'orders': orders,
@@ -282,12 +282,12 @@ def export_orders_excel(request):
         orders = orders.filter(status=status)
     
     date_from = request.GET.get('date_from', '')
-    if date_from:
-        orders = orders.filter(created_at__date__gte=date_from)
+    if _parse_day(date_from):
+        orders = orders.created_since(_parse_day(date_from))
     
     date_to = request.GET.get('date_to', '')
-    if date_to:
-        orders = orders.filter(created_at__date__lte=date_to)
+    if _parse_day(date_to):
+        orders = orders.created_until(_parse_day(date_to))
     
     # Создаем DataFrame
     data = []
@@ -349,7 +349,7 @@ def export_products_excel(request):
     """Экспорт товаров в Excel"""
     
     # Получаем данные
-    products = Product.objects.annotate(
+    products = Product.objects.with_category().annotate(
         total_sold=Sum('orderitem__quantity'),
         total_revenue=Sum(F('orderitem__quantity') * F('orderitem__price'))
     ).order_by('-total_revenue')
@@ -427,19 +427,17 @@ def export_dashboard_excel(request):
         total_customers = Order.objects.values('user').distinct().count()
         avg_order_value = Order.objects.aggregate(avg=Avg('total_price'))['avg'] or 0
         
-        today_orders = Order.objects.filter(created_at__date=today).count()
-        today_revenue = Order.objects.filter(created_at__date=today).aggregate(total=Sum('total_price'))['total'] or 0
+        today_orders = Order.objects.created_on(today).count()
+        today_revenue = Order.objects.created_on(today).aggregate(total=Sum('total_price'))['total'] or 0
         
-        week_orders = Order.objects.filter(created_at__date__gte=last_7_days).count()
-        week_revenue = Order.objects.filter(created_at__date__gte=last_7_days).aggregate(total=Sum('total_price'))['total'] or 0
+        week_orders = Order.objects.created_since(last_7_days).count()
+        week_revenue = Order.objects.created_since(last_7_days).aggregate(total=Sum('total_price'))['total'] or 0
         
-        month_orders = Order.objects.filter(created_at__date__gte=last_30_days).count()
-        month_revenue = Order.objects.filter(created_at__date__gte=last_30_days).aggregate(total=Sum('total_price'))['total'] or 0
+        month_orders = Order.objects.created_since(last_30_days).count()
+        month_revenue = Order.objects.created_since(last_30_days).aggregate(total=Sum('total_price'))['total'] or 0
         
         # Новые и постоянные клиенты
-        new_customers = Order.objects.filter(
-            created_at__date__gte=last_30_days
-        ).values('user').distinct().count()
+        new_customers = Order.objects.created_since(last_30_days).values('user').distinct().count()
         
         returning_customers = Order.objects.values('user').annotate(
             order_count=Count('id')
@@ -516,7 +514,7 @@ def export_dashboard_excel(request):
         
         # 3. Лист с товарами
         products_data = []
-        for product in Product.objects.annotate(
+        for product in Product.objects.with_category().annotate(
             total_sold=Sum('orderitem__quantity'),
             total_revenue=Sum(F('orderitem__quantity') * F('orderitem__price'))
         ).order_by('-total_revenue'):
@@ -609,8 +607,8 @@ def export_dashboard_excel(request):
         sales_chart_data = []
         for i in range(30):
             date = today - timedelta(days=i)
-            daily_orders = Order.objects.filter(created_at__date=date).count()
-            daily_revenue = Order.objects.filter(created_at__date=date).aggregate(total=Sum('total_price'))['total'] or 0
+            daily_orders = Order.objects.created_on(date).count()
+            daily_revenue = Order.objects.created_on(date).aggregate(total=Sum('total_price'))['total'] or 0
             sales_chart_data.append({
                 'Дата': date.strftime('%d.%m.%Y'),
                 'Заказы': daily_orders,
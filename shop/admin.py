@@ -1,20 +1,16 @@
 from django.contrib import admin
 from django.db.models import Count
 from .models import Category, Product, Cart, CartItem, Order, OrderItem, Review, BankAccount
+from . import ratings
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug', 'product_count', 'created_at')
+    list_display = ('name', 'slug', 'product_count', 'available_count', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ('created_at',)
-    
-    def product_count(self, obj):
-        count = obj.product_set.count()
-        return count if count > 0 else 'Нет товаров'
-    product_count.short_description = 'Количество товаров'
+    readonly_fields = ('created_at', 'product_count', 'available_count')
 
 
 class CartItemInline(admin.TabularInline):
@@ -31,6 +27,20 @@ class CartAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     inlines = [CartItemInline]
 
+    def get_queryset(self, request):
+        # Итоги всех корзин страницы считаются тем же запросом, что и список
+        return super().get_queryset(request).select_related('user').with_totals()
+
+    def total_items(self, obj):
+        return obj.total_items
+    total_items.short_description = 'Товаров'
+    total_items.admin_order_field = 'items_count'
+
+    def total_price(self, obj):
+        return obj.total_price
+    total_price.short_description = 'Сумма'
+    total_price.admin_order_field = 'items_total'
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -65,12 +75,12 @@ class OrderAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock', 'available', 'created_at')
+    list_display = ('name', 'category', 'price', 'stock', 'available', 'rating_avg', 'rating_count', 'created_at')
     list_filter = ('category', 'available', 'created_at')
     search_fields = ('name', 'description', 'category__name')
     list_editable = ('price', 'stock', 'available')
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('rating_avg', 'rating_count', 'created_at', 'updated_at')
     ordering = ('-created_at',)
     
     def changelist_view(self, request, extra_context=None):
@@ -101,7 +111,7 @@ class ProductAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('category')
+        return super().get_queryset(request).with_category()
 
 
 @admin.register(Review)
@@ -115,11 +125,12 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews', 'disapprove_reviews']
     
     def approve_reviews(self, request, queryset):
-        queryset.update(approved=True)
+        # update() не отправляет сигналы, поэтому оценки товаров и кеш обновляет set_approved
+        ratings.set_approved(queryset, True)
     approve_reviews.short_description = 'Одобрить выбранные отзывы'
     
     def disapprove_reviews(self, request, queryset):
-        queryset.update(approved=False)
+        ratings.set_approved(queryset, False)
     disapprove_reviews.short_description = 'Отклонить выбранные отзывы'
 
 
@@ -0,0 +1,77 @@
+"""Поля JSON API каталога и ETag ответов.
+
+Клиент выбирает поля параметром fields=id,name,price; из базы читаются
+только столбцы выбранных полей. Ответы зависят только от каталога и
+параметров запроса, поэтому ETag строится из версии каталога и URL:
+пока каталог не менялся, повторный запрос получает 304.
+"""
+import hashlib
+
+from .cache import catalog_version
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+# Поле ответа -> (столбцы для only(), значение для объекта)
+PRODUCT_FIELDS = {
+    'id': (['id'], lambda product: product.id),
+    'name': (['name'], lambda product: product.name),
+    'slug': (['slug'], lambda product: product.slug),
+    'description': (['description'], lambda product: product.description),
+    'price': (['price'], lambda product: str(product.price)),
+    'stock': (['stock'], lambda product: product.stock),
+    'available': (['available'], lambda product: product.available),
+    'in_stock': (['stock', 'available'], lambda product: product.is_in_stock),
+    'category_id': (['category'], lambda product: product.category_id),
+    'category': (['category__name'], lambda product: product.category.name),
+    'rating_avg': (['rating_avg'], lambda product: round(product.rating_avg, 2)),
+    'rating_count': (['rating_count'], lambda product: product.rating_count),
+    'url': (['slug'], lambda product: product.get_absolute_url()),
+    'image_url': (['image', 'stored_image'], lambda product: product.get_image_url()),
+    'created_at': (['created_at'], lambda product: _iso(product.created_at)),
+    'updated_at': (['updated_at'], lambda product: _iso(product.updated_at)),
+}
+DEFAULT_PRODUCT_FIELDS = ['id', 'name', 'slug', 'price', 'category', 'in_stock', 'url', 'image_url']
+
+CATEGORY_FIELDS = {
+    'id': (['id'], lambda category: category.id),
+    'name': (['name'], lambda category: category.name),
+    'slug': (['slug'], lambda category: category.slug),
+    'description': (['description'], lambda category: category.description),
+    'url': (['slug'], lambda category: category.get_absolute_url()),
+    'image_url': (['image', 'stored_image'], lambda category: category.get_image_url()),
+    'product_count': (['product_count'], lambda category: category.product_count),
+    'available_count': (['available_count'], lambda category: category.available_count),
+}
+DEFAULT_CATEGORY_FIELDS = ['id', 'name', 'slug', 'url', 'image_url', 'available_count']
+
+
+def parse_fields(value, spec, default):
+    """Список полей из параметра fields; ValueError со списком неизвестных полей"""
+    if not value:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in spec]
+    if unknown or not names:
+        raise ValueError(unknown)
+    return names
+
+
+def only_columns(names, spec, extra=()):
+    """Столбцы для QuerySet.only(): поля ответа и, например, поля сортировки"""
+    columns = list(extra)
+    for name in names:
+        columns.extend(spec[name][0])
+    return list(dict.fromkeys(columns))
+
+
+def serialize(objects, names, spec):
+    getters = [(name, spec[name][1]) for name in names]
+    return [{name: getter(obj) for name, getter in getters} for obj in objects]
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag для django.views.decorators.http.etag"""
+    return hashlib.md5(f'{catalog_version()}:{request.get_full_path()}'.encode('utf-8')).hexdigest()
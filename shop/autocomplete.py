@@ -0,0 +1,189 @@
+"""Подсказки для строки поиска.
+
+Названия товаров и категорий лежат в памяти процесса отсортированным
+списком ключей: ключ - название, начиная с каждого его слова. Подсказки
+для префикса - это отрезок списка, который находится двоичным поиском,
+поэтому на запрос база не нужна. Индекс пересобирается, когда меняется
+версия каталога (см. shop.cache), в отдельном потоке; пока идет сборка,
+отвечает старый индекс.
+"""
+import bisect
+import heapq
+import logging
+import threading
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.urls import reverse
+
+from .cache import catalog_version
+from .fuzzy import layout_variants, normalize
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+# Ответы для коротких префиксов считаем при сборке: им подходит слишком много ключей
+SHORT_PREFIX = 2
+# Сколько лучших подсказок хранить для короткого префикса
+SHORT_LIMIT = 20
+# Сколько ключей просматривать для длинного префикса
+SCAN_LIMIT = 2000
+
+PLACEHOLDER = 'placeholder'
+
+
+class PrefixIndex:
+    """Отсортированные ключи названий и заранее посчитанные короткие префиксы.
+
+    items - подсказки в порядке важности: при равном совпадении
+    выше та, что раньше в списке.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        entries = []
+        for number, item in enumerate(self.items):
+            words = normalize(item['name']).split()
+            for start in range(len(words)):
+                # Совпадение с началом названия важнее совпадения с началом слова
+                entries.append((' '.join(words[start:]), (start > 0, number)))
+        entries.sort()
+        self.keys = [key for key, rank in entries]
+        self.ranks = [rank for key, rank in entries]
+
+        self.short = {}
+        for length in range(1, SHORT_PREFIX + 1):
+            for prefix in {key[:length] for key in self.keys}:
+                self.short[prefix] = self._scan(prefix, SHORT_LIMIT, len(self.keys))
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def _unique(ranks, limit):
+        """Номера подсказок без повторов; ranks уже отсортированы"""
+        numbers = []
+        for later_word, number in ranks:
+            if number not in numbers:
+                numbers.append(number)
+                if len(numbers) == limit:
+                    break
+        return numbers
+
+    def _scan(self, prefix, limit, scan_limit):
+        """Лучшие подсказки среди первых scan_limit ключей с префиксом"""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start, min(start + scan_limit, len(self.keys)))
+        return self._unique(heapq.nsmallest(limit * 2, self.ranks[start:end]), limit)
+
+    def _numbers(self, prefix, limit):
+        if len(prefix) <= SHORT_PREFIX:
+            return self.short.get(prefix, [])[:limit]
+        return self._scan(prefix, limit, SCAN_LIMIT)
+
+    def search(self, query, limit=8):
+        """Подсказки, чьи слова начинаются с запроса; учитывает раскладку"""
+        numbers = []
+        for variant in layout_variants(query):
+            for number in self._numbers(variant, limit):
+                if number not in numbers:
+                    numbers.append(number)
+            # Другую раскладку пробуем, только если подсказок не хватило
+            if len(numbers) >= limit:
+                break
+        return [self.items[number] for number in numbers[:limit]]
+
+
+def _url_template(name, kwarg):
+    """URL с заглушкой вместо параметра: reverse() на каждый товар слишком медленный"""
+    url = reverse(name, kwargs={kwarg: PLACEHOLDER})
+    return lambda value: url.replace(PLACEHOLDER, str(value))
+
+
+def build_indexes():
+    """Индексы категорий и товаров; товары с оценками идут первыми"""
+    category_url = _url_template('shop:category_detail', 'slug')
+    categories = PrefixIndex(
+        {'name': name, 'url': category_url(slug)}
+        for name, slug in Category.objects.order_by('name').values_list('name', 'slug')
+    )
+
+    product_url = _url_template('shop:product_detail', 'slug')
+    image_url = _url_template('shop:image', 'digest')
+    rows = Product.objects.filter(available=True).order_by('-rating_count', 'name', 'id').values_list(
+        'id', 'name', 'slug', 'price', 'stored_image', 'image'
+    )
+    products = PrefixIndex(
+        {
+            'id': pk,
+            'name': name,
+            'price': str(price),
+            'url': product_url(slug),
+            # Как Product.get_image_url(): сначала изображение из базы, потом файл
+            'image_url': image_url(digest) if digest else (default_storage.url(image) if image else None),
+        }
+        for pk, name, slug, price, digest, image in rows.iterator(chunk_size=2000)
+    )
+    return categories, products
+
+
+_lock = threading.Lock()
+_indexes = None
+_version = None
+
+
+def _rebuild(version):
+    global _indexes, _version
+    _indexes = build_indexes()
+    _version = version
+
+
+def _rebuild_in_background(version):
+    try:
+        _rebuild(version)
+    except Exception as e:
+        logger.warning('Индекс подсказок не пересобран: %s', e)
+    finally:
+        # У потока свое подключение к базе, закрываем его сами
+        connection.close()
+        _lock.release()
+
+
+def get_indexes():
+    version = catalog_version()
+    if _indexes is None:
+        with _lock:
+            if _indexes is None:
+                _rebuild(version)
+    elif version != _version and _lock.acquire(blocking=False):
+        # Запрос не ждет сборки: пока она идет, отвечает старый индекс
+        threading.Thread(target=_rebuild_in_background, args=(version,), daemon=True).start()
+    return _indexes
+
+
+def _warm_up():
+    try:
+        categories, products = get_indexes()
+    except Exception as e:
+        logger.warning('Индекс подсказок не собран: %s', e)
+    else:
+        logger.info('Индекс подсказок: %s категорий, %s товаров', len(categories), len(products))
+    finally:
+        connection.close()
+
+
+def warm_up():
+    """Собирает индекс заранее в фоновом потоке, чтобы первый посетитель не ждал.
+
+    Старт воркера не ждет сборки и не падает, если база еще недоступна:
+    тогда индекс соберет первый запрос подсказок.
+    """
+    threading.Thread(target=_warm_up, daemon=True).start()
+
+
+def suggest(query, limit=8):
+    categories, products = get_indexes()
+    return {
+        'categories': categories.search(query, limit=3),
+        'products': products.search(query, limit=limit),
+    }
@@ -0,0 +1,153 @@
+"""Кеш страниц и фрагментов каталога.
+
+Все ключи содержат номер версии каталога. Сигналы увеличивают версию при
+любом изменении товара, категории или отзыва, поэтому старые записи
+просто перестают читаться и устаревшие данные никогда не показываются.
+
+Кроме того, страницы товара и категории отвечают на условные запросы
+браузеров и поисковых роботов (If-None-Match, If-Modified-Since) ответом 304.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+VERSION_KEY = 'catalog:version'
+
+CSRF_PLACEHOLDER = '__CSRF_TOKEN__'
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Если ключ вытеснили из кеша, новая версия все равно больше старой
+        version = time.time_ns() // 1000
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Делает недействительными все закешированные страницы и фрагменты каталога"""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # Ключа нет - первое же чтение создаст версию больше прежней
+        return catalog_version()
+
+
+def catalog_key(*parts):
+    return ':'.join(['catalog', str(catalog_version()), *map(str, parts)])
+
+
+def cached_catalog(name, build):
+    """Значение build(), закешированное до следующего изменения каталога"""
+    return cache.get_or_set(catalog_key(name), build, timeout())
+
+
+def _has_pending_messages(request):
+    # Сообщения показываются один раз, такую страницу кешировать нельзя
+    return 'messages' in request.COOKIES or bool(request.session.get('_messages'))
+
+
+def _is_cacheable(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not _has_pending_messages(request)
+        # Значок корзины в шапке у каждого свой
+        and not request.session.get('cart_items')
+    )
+
+
+def cache_anonymous_page(view):
+    """Кеширует страницу целиком для анонимных посетителей.
+
+    CSRF-токен у каждого посетителя свой, поэтому в кеш страница попадает
+    с заглушкой вместо токена, а при выдаче заглушка заменяется токеном
+    текущего посетителя.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not _is_cacheable(request):
+            return view(request, *args, **kwargs)
+
+        path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        key = catalog_key('page', path_hash)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            if CSRF_PLACEHOLDER in content:
+                content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+            return HttpResponse(content, content_type=content_type)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+
+        content = _CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+        cache.set(key, (content, response['Content-Type']), timeout())
+        return response
+
+    return wrapped
+
+
+def conditional_page(page_state):
+    """Отвечает 304, если у клиента уже есть текущая версия страницы.
+
+    page_state(request, **kwargs) одним дешевым запросом возвращает
+    (время последнего изменения, [части ETag]) или None, если объекта нет -
+    тогда страницу отрисовывает view. Пользователь и корзина в шапке тоже
+    входят в ETag, а страницы с непоказанными сообщениями не сравниваются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _has_pending_messages(request):
+                return view(request, *args, **kwargs)
+            state = page_state(request, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+
+            last_modified, parts = state
+            parts = [
+                *parts,
+                request.user.pk,
+                request.session.get('cart_items'),
+                request.get_full_path(),
+                getattr(settings, 'RELEASE_ID', ''),
+            ]
+            etag = quote_etag(hashlib.md5(':'.join(map(str, parts)).encode('utf-8')).hexdigest())
+            last_modified = int(last_modified.timestamp())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+            # Браузер хранит копию, но каждый раз сверяет ее с сервером
+            if request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapped
+
+    return decorator
@@ -0,0 +1,196 @@
+"""Корзина покупателя.
+
+У вошедшего пользователя корзина хранится в базе (Cart), у анонимного
+посетителя - только в сессии, поэтому просмотр магазина без входа ничего
+не пишет в таблицы корзины. При входе корзина из сессии переносится в
+корзину пользователя одной транзакцией.
+
+Позиции читаются одним запросом вместе с товарами, итоги считаются одним
+агрегатом в SQL. Краткая сводка (число товаров и сумма) лежит в сессии:
+по ней шапка показывает значок корзины, не обращаясь к таблицам корзины.
+Сводку обновляет каждый код, который меняет корзину.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from .models import Cart, CartItem, Product
+
+SESSION_CART_KEY = 'cart'
+SESSION_ITEMS_KEY = 'cart_items'
+SESSION_TOTAL_KEY = 'cart_total'
+
+# Сводка пустой корзины: такую в сессию не пишем
+_EMPTY_SUMMARY = {SESSION_ITEMS_KEY: 0, SESSION_TOTAL_KEY: '0.00'}
+
+# Сколько позиций можно изменить одним запросом к API корзины
+MAX_CHANGES = 100
+
+
+class SessionCart:
+    """Корзина анонимного посетителя: {id товара: количество} в сессии.
+
+    Повторяет интерфейс Cart, который нужен страницам корзины.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def quantities(self):
+        return {int(pk): quantity for pk, quantity in self.session.get(SESSION_CART_KEY, {}).items()}
+
+    def _store(self, quantities):
+        if quantities:
+            # Ключи JSON-сессии - только строки
+            self.session[SESSION_CART_KEY] = {str(pk): quantity for pk, quantity in quantities.items()}
+        elif SESSION_CART_KEY in self.session:
+            del self.session[SESSION_CART_KEY]
+        self.__dict__.pop('totals', None)
+
+    def lines(self):
+        quantities = self.quantities
+        if not quantities:
+            return []
+        products = Product.objects.select_related('category').in_bulk(list(quantities))
+        # Удаленные из каталога товары просто пропадают из корзины
+        return [
+            CartItem(product=products[pk], quantity=quantity)
+            for pk, quantity in quantities.items() if pk in products
+        ]
+
+    @cached_property
+    def totals(self):
+        quantities = self.quantities
+        if not quantities:
+            return 0, Decimal('0')
+        count, total = 0, Decimal('0')
+        for pk, price in Product.objects.filter(pk__in=list(quantities)).values_list('pk', 'price'):
+            count += quantities[pk]
+            total += price * quantities[pk]
+        return count, total
+
+    @property
+    def total_price(self):
+        return self.totals[1]
+
+    @property
+    def total_items(self):
+        return self.totals[0]
+
+    def add(self, product, quantity=1, override=False):
+        self.update({product.pk: (quantity, not override)})
+
+    def update(self, changes):
+        quantities = self.quantities
+        changed = {}
+        for pk, (quantity, relative) in changes.items():
+            changed[pk] = min(max(quantities.get(pk, 0) + quantity if relative else quantity, 0), CartItem.MAX_QUANTITY)
+            if changed[pk]:
+                quantities[pk] = changed[pk]
+            else:
+                quantities.pop(pk, None)
+        self._store(quantities)
+        return changed
+
+    def remove(self, product):
+        quantities = self.quantities
+        quantities.pop(product.pk, None)
+        self._store(quantities)
+
+    def clear(self):
+        self._store({})
+
+
+def parse_changes(data):
+    """Изменения корзины из JSON API: {id товара: (количество, прибавить ли)}.
+
+    Каждая строка - {"product": id, "quantity": n} (заменить количество,
+    0 - удалить) или {"product": id, "delta": n} (прибавить, можно
+    отрицательное), по модулю не больше CartItem.MAX_QUANTITY.
+    ValueError со словарем ошибок по номерам строк.
+    """
+    lines = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(lines, list) or not lines:
+        raise ValueError({'items': 'Нужен непустой список изменений'})
+    if len(lines) > MAX_CHANGES:
+        raise ValueError({'items': f'Не больше {MAX_CHANGES} изменений за запрос'})
+
+    changes, errors = {}, {}
+    for number, line in enumerate(lines):
+        if not isinstance(line, dict):
+            errors[number] = 'Ожидается объект'
+            continue
+        pk = line.get('product')
+        relative = 'delta' in line
+        value = line.get('delta' if relative else 'quantity')
+        if type(pk) is not int or pk <= 0:
+            errors[number] = 'Некорректный товар'
+        elif type(value) is not int or (not relative and value < 0) or ('delta' in line and 'quantity' in line):
+            errors[number] = 'Укажите quantity >= 0 или целое delta'
+        elif abs(value) > CartItem.MAX_QUANTITY:
+            errors[number] = f'Количество не больше {CartItem.MAX_QUANTITY}'
+        elif relative and pk in changes:
+            # Несколько delta для одного товара складываются
+            previous, previous_relative = changes[pk]
+            changes[pk] = (previous + value, previous_relative)
+        else:
+            changes[pk] = (value, relative)
+    if errors:
+        raise ValueError(errors)
+    return changes
+
+
+def get_cart(request):
+    """Корзина пользователя в базе или корзина анонимного посетителя в сессии"""
+    if request.user.is_authenticated:
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        return cart
+    return SessionCart(request.session)
+
+
+def merge_session_cart(session, user):
+    """Переносит корзину из сессии в корзину пользователя.
+
+    Количество одинаковых товаров складывается, но не больше
+    CartItem.MAX_QUANTITY. Все изменения - в одной транзакции; корзина
+    пользователя блокируется, чтобы одновременный вход с двух устройств
+    не потерял позиции.
+    """
+    quantities = SessionCart(session).quantities
+    if not quantities:
+        return None
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart = Cart.objects.select_for_update().get(pk=cart.pk)
+        existing = {item.product_id: item for item in cart.items.filter(product__in=list(quantities))}
+        known = set(Product.objects.filter(pk__in=list(quantities)).values_list('pk', flat=True))
+
+        new_items, changed_items = [], []
+        for pk, quantity in quantities.items():
+            if pk not in known:
+                continue
+            # Сумма двух корзин тоже не больше предела одной позиции
+            if pk in existing:
+                existing[pk].quantity = min(existing[pk].quantity + quantity, CartItem.MAX_QUANTITY)
+                changed_items.append(existing[pk])
+            else:
+                new_items.append(CartItem(cart=cart, product_id=pk, quantity=min(quantity, CartItem.MAX_QUANTITY)))
+        CartItem.objects.bulk_create(new_items)
+        CartItem.objects.bulk_update(changed_items, ['quantity'])
+
+    SessionCart(session).clear()
+    return cart
+
+
+def store_summary(session, cart):
+    """Записывает в сессию число товаров и сумму корзины"""
+    count, total = cart.totals if cart is not None else (0, 0)
+    summary = {SESSION_ITEMS_KEY: count, SESSION_TOTAL_KEY: format(total, '.2f')}
+    # Сессию сохраняем, только если сводка изменилась; пустую не создаем
+    for key, value in summary.items():
+        if session.get(key, _EMPTY_SUMMARY[key]) != value:
+            session[key] = value
+    return count, total
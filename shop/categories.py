@@ -0,0 +1,90 @@
+"""Категории со счетчиками товаров для навигации.
+
+Счетчики (всего товаров и товаров в продаже) хранятся прямо в Category и
+меняются одним UPDATE с F-выражениями при сохранении и удалении товара.
+Список категорий держится в памяти процесса до смены версии каталога,
+поэтому главная, каталог и форма фильтров не читают его из базы заново.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import catalog_version
+from .models import Category, Product
+
+
+def product_state(product):
+    """(категория, в продаже) товара - то, от чего зависят счетчики"""
+    return product.category_id, product.available
+
+
+def apply_delta(category_id, total_delta, available_delta):
+    if not total_delta and not available_delta:
+        return
+    Category.objects.filter(pk=category_id).update(
+        # Список товаров категории изменился
+        updated_at=timezone.now(),
+        product_count=F('product_count') + total_delta,
+        available_count=F('available_count') + available_delta,
+    )
+
+
+def apply_change(old_state, new_state):
+    """Обновляет счетчики по разнице между прежним и новым состоянием товара"""
+    if old_state == new_state:
+        return
+    if old_state and new_state and old_state[0] == new_state[0]:
+        # Категория та же, изменилась только доступность
+        apply_delta(old_state[0], 0, int(new_state[1]) - int(old_state[1]))
+        return
+    if old_state and old_state[0]:
+        apply_delta(old_state[0], -1, -int(old_state[1]))
+    if new_state and new_state[0]:
+        apply_delta(new_state[0], 1, int(new_state[1]))
+
+
+def rebuild():
+    """Пересчитывает счетчики всех категорий по таблице товаров"""
+    products = Product.objects.filter(category=OuterRef('pk')).order_by().values('category')
+
+    def count(queryset):
+        return Coalesce(
+            Subquery(queryset.annotate(value=Count('id')).values('value'), output_field=IntegerField()),
+            Value(0)
+        )
+
+    with transaction.atomic():
+        Category.objects.update(
+            product_count=count(products),
+            available_count=count(products.filter(available=True)),
+        )
+
+
+_lock = threading.Lock()
+_tree = None
+_version = None
+
+
+def category_tree():
+    """Все категории в порядке Meta.ordering, общие для потоков процесса.
+
+    Объекты только для чтения: их нельзя менять и сохранять.
+    """
+    global _tree, _version
+    version = catalog_version()
+    if _tree is None or version != _version:
+        with _lock:
+            if _tree is None or version != _version:
+                _tree = list(Category.objects.all())
+                _version = version
+    return _tree
+
+
+def category_by_pk(pk):
+    for category in category_tree():
+        if category.pk == pk:
+            return category
+    return None
@@ -1,4 +1,7 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .cache import catalog_version, timeout
 
 def shop_settings(request):
     """Добавляет настройки магазина в контекст всех шаблонов"""
@@ -14,3 +17,12 @@ def shop_settings(request):
             'SHOP_MAP_URL': getattr(settings, 'SHOP_MAP_URL', '#'),
         }
     }
+
+
+def catalog_cache(request):
+    """Версия каталога и время жизни для тега {% cache %} в шаблонах"""
+    return {
+        # Версию читаем из кеша, только если шаблон ее использует
+        'catalog_version': SimpleLazyObject(catalog_version),
+        'catalog_cache_timeout': timeout(),
+    }
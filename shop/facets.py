@@ -0,0 +1,128 @@
+"""Количество товаров по значениям фильтров каталога.
+
+Все счетчики считаются одним запросом с GROUP BY по категории, ценовому
+диапазону, наличию и попаданию в выбранный диапазон цен. Для каждого
+фильтра учитываются все остальные выбранные фильтры, кроме него самого:
+так видно, сколько товаров станет, если поменять только этот фильтр.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Count, IntegerField, Q, Value, When
+
+from .categories import category_tree
+
+# Ценовые диапазоны фильтра: (от, до), граница "до" не включается
+PRICE_BUCKETS = [
+    (None, 500),
+    (500, 1000),
+    (1000, 5000),
+    (5000, 20000),
+    (20000, None),
+]
+
+
+# Шаг цены в Product.price: фильтр price_max включает границу, поэтому
+# ссылка диапазона передает "до" минус один шаг
+PRICE_STEP = Decimal('0.01')
+
+
+def bucket_label(low, high):
+    if low is None:
+        return f'до {high} сом'
+    if high is None:
+        return f'от {low} сом'
+    return f'{low} - {high} сом'
+
+
+def _bucket_expression():
+    whens = [
+        When(price__lt=high, then=Value(position))
+        for position, (low, high) in enumerate(PRICE_BUCKETS) if high is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def _flag(condition):
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+def facet_counts(queryset, filters):
+    """Счетчики для боковой панели каталога.
+
+    queryset - товары до применения фильтров, filters - cleaned_data
+    формы ProductFilterForm (category, price_min, price_max, in_stock, min_rating).
+    """
+    category = filters.get('category')
+    price_min = filters.get('price_min')
+    price_max = filters.get('price_max')
+    in_stock = filters.get('in_stock')
+    # Оценка не выводится как фильтр со счетчиками, но сужает все остальные
+    if filters.get('min_rating'):
+        queryset = queryset.filter(rating_avg__gte=filters['min_rating'])
+
+    price_condition = Q()
+    if price_min:
+        price_condition &= Q(price__gte=price_min)
+    if price_max:
+        price_condition &= Q(price__lte=price_max)
+
+    rows = (
+        queryset.order_by()
+        .annotate(
+            bucket=_bucket_expression(),
+            has_stock=_flag(Q(stock__gt=0)),
+            in_range=_flag(price_condition) if price_condition else Value(True, output_field=BooleanField()),
+        )
+        .values('category_id', 'bucket', 'has_stock', 'in_range')
+        .annotate(count=Count('id'))
+    )
+
+    category_id = category.pk if category else None
+    by_category = defaultdict(int)
+    by_bucket = defaultdict(int)
+    stock = {'all': 0, 'in_stock': 0}
+    total = 0
+    for row in rows:
+        count = row['count']
+        category_ok = category_id is None or row['category_id'] == category_id
+        stock_ok = not in_stock or row['has_stock']
+        price_ok = row['in_range']
+
+        if price_ok and stock_ok:
+            by_category[row['category_id']] += count
+        # Ценовые диапазоны заменяют ручной ввод цены, поэтому его не учитываем
+        if category_ok and stock_ok:
+            by_bucket[row['bucket']] += count
+        if category_ok and price_ok:
+            stock['all'] += count
+            if row['has_stock']:
+                stock['in_stock'] += count
+        if category_ok and price_ok and stock_ok:
+            total += count
+
+    categories = [
+        {
+            'id': entry.pk,
+            'name': entry.name,
+            'slug': entry.slug,
+            'count': by_category.get(entry.pk, 0),
+            'selected': entry.pk == category_id,
+        }
+        for entry in category_tree()
+    ]
+    price_ranges = [
+        {
+            'label': bucket_label(low, high),
+            'price_min': low,
+            'price_max': high - PRICE_STEP if high is not None else None,
+            'count': by_bucket.get(position, 0),
+        }
+        for position, (low, high) in enumerate(PRICE_BUCKETS)
+    ]
+    return {
+        'total': total,
+        'categories': categories,
+        'price_ranges': price_ranges,
+        'availability': stock,
+    }
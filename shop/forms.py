@@ -1,10 +1,38 @@
 from django import forms
-from .models import Product, Category, Review
+from .models import CartItem, Product, Review
+from .categories import category_by_pk, category_tree
+
+
+class CategoryChoiceField(forms.ChoiceField):
+    """Выбор категории из списка в памяти процесса, без запроса к базе"""
+
+    def __init__(self, empty_label="---------", **kwargs):
+        self.empty_label = empty_label
+        super().__init__(choices=self.category_choices, **kwargs)
+
+    def category_choices(self):
+        return [('', self.empty_label)] + [(category.pk, category.name) for category in category_tree()]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            category = category_by_pk(int(value))
+        except (TypeError, ValueError):
+            category = None
+        if category is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return category
+
+    def validate(self, value):
+        # Наличие категории уже проверено в to_python
+        forms.Field.validate(self, value)
 
 
 class ProductFilterForm(forms.Form):
-    category = forms.ModelChoiceField(
-        queryset=Category.objects.all(),
+    category = CategoryChoiceField(
         required=False,
         empty_label="Все категории",
         label="Категория"
@@ -23,6 +51,17 @@ class ProductFilterForm(forms.Form):
         required=False,
         label="Только в наличии"
     )
+    min_rating = forms.TypedChoiceField(
+        choices=[
+            ('', 'Любая'),
+            (4, '4 и выше'),
+            (3, '3 и выше'),
+        ],
+        coerce=int,
+        empty_value=None,
+        required=False,
+        label="Оценка"
+    )
     sort_by = forms.ChoiceField(
         choices=[
             ('created_at', 'Новинки'),
@@ -30,6 +69,7 @@ class ProductFilterForm(forms.Form):
             ('-price', 'Цена: по убыванию'),
             ('name', 'Название: А-Я'),
             ('-name', 'Название: Я-А'),
+            ('-rating_avg', 'Оценка: по убыванию'),
         ],
         required=False,
         label="Сортировка"
@@ -53,6 +93,7 @@ class ReviewForm(forms.ModelForm):
 class CartAddProductForm(forms.Form):
     quantity = forms.IntegerField(
         min_value=1,
+        max_value=CartItem.MAX_QUANTITY,
         initial=1,
         label="Количество"
     )
@@ -0,0 +1,142 @@
+"""Нечеткий поиск товаров по названию на триграммах.
+
+Индекс строится в памяти процесса один раз и пересобирается, только
+когда меняется каталог. Запрос сравнивается с названиями по доле общих
+триграмм, поэтому опечатки ("тетратдь") и набор в другой раскладке
+("ntnhflm") все равно находят нужный товар.
+"""
+import re
+import threading
+
+import numpy as np
+from django.db.models import Case, Count, IntegerField, Max, When
+
+from .models import Product
+
+# Раскладка ЙЦУКЕН на тех же клавишах, что и QWERTY
+_LATIN_KEYS = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_CYRILLIC_KEYS = 'йцукенгшщзхъфывапролджэячсмитьбюё'
+_TO_CYRILLIC = str.maketrans(_LATIN_KEYS, _CYRILLIC_KEYS)
+_TO_LATIN = str.maketrans(_CYRILLIC_KEYS, _LATIN_KEYS)
+
+# Кыргызские буквы приводим к русским, чтобы их можно было набрать на русской раскладке
+_FOLD = str.maketrans({'ё': 'е', 'ң': 'н', 'ө': 'о', 'ү': 'у'})
+_SEPARATORS_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+# Минимальная доля триграмм запроса, которые должны найтись в названии
+MIN_SIMILARITY = 0.45
+
+
+def normalize(text):
+    return _SEPARATORS_RE.sub(' ', text.lower().translate(_FOLD)).strip()
+
+
+def layout_variants(query):
+    """Запрос как есть и с исправленной раскладкой клавиатуры"""
+    query = query.lower()
+    variants = [normalize(query)]
+    # Знаки препинания тоже стоят на буквенных клавишах, поэтому переводим до нормализации
+    for converted in (query.translate(_TO_CYRILLIC), query.translate(_TO_LATIN)):
+        converted = normalize(converted)
+        if converted and converted not in variants:
+            variants.append(converted)
+    return variants
+
+
+def trigrams(text):
+    """Триграммы слов, как в pg_trgm: слово дополняется пробелами по краям"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Обратный индекс: триграмма -> номера названий, в которых она встречается"""
+
+    def __init__(self, rows):
+        self.ids = []
+        self.names = []
+        postings = {}
+        sizes = []
+        for pk, name in rows:
+            position = len(self.ids)
+            grams = trigrams(name)
+            self.ids.append(pk)
+            self.names.append(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+
+        self.ids = np.array(self.ids, dtype=np.int64)
+        self.sizes = np.array(sizes, dtype=np.float32)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, limit=10, min_similarity=MIN_SIMILARITY):
+        """Возвращает [(id товара, сходство)] от лучшего совпадения к худшему"""
+        if not len(self):
+            return []
+
+        best_score = np.zeros(len(self), dtype=np.float32)
+        best_overlap = np.zeros(len(self), dtype=np.float32)
+        for variant in layout_variants(query):
+            grams = trigrams(variant)
+            lists = [self.postings[gram] for gram in grams if gram in self.postings]
+            if not lists:
+                continue
+            shared = np.bincount(np.concatenate(lists), minlength=len(self)).astype(np.float32)
+            # Доля триграмм запроса, найденных в названии
+            score = shared / len(grams)
+            # Среди равных выше те названия, в которых меньше лишнего
+            overlap = shared / (len(grams) + self.sizes - shared)
+            best_score = np.maximum(best_score, score)
+            best_overlap = np.maximum(best_overlap, overlap)
+
+        candidates = np.flatnonzero(best_score >= min_similarity)
+        order = np.lexsort((-best_overlap[candidates], -best_score[candidates]))[:limit]
+        top = candidates[order]
+        return [(int(self.ids[i]), float(best_score[i])) for i in top]
+
+
+_lock = threading.Lock()
+_index = None
+_signature = None
+
+
+def catalog_signature():
+    """Меняется при любом добавлении, удалении или изменении товара"""
+    stats = Product.objects.filter(available=True).aggregate(
+        updated=Max('updated_at'), count=Count('id')
+    )
+    return stats['updated'], stats['count']
+
+
+def get_index():
+    global _index, _signature
+    signature = catalog_signature()
+    if _index is None or signature != _signature:
+        with _lock:
+            # Пока ждали блокировку, индекс мог пересобрать другой поток
+            if _index is None or signature != _signature:
+                rows = Product.objects.filter(available=True).values_list('id', 'name')
+                _index = TrigramIndex(rows.iterator())
+                _signature = signature
+    return _index
+
+
+def fuzzy_products(queryset, query, limit=48):
+    """Товары, похожие по названию на запрос, в порядке убывания сходства"""
+    matches = get_index().search(query, limit=limit)
+    if not matches:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, (pk, score) in enumerate(matches)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=[pk for pk, score in matches]).annotate(
+        fuzzy_rank=ranking
+    ).order_by('fuzzy_rank')
@@ -0,0 +1,244 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+
+# Сигнатуры форматов: (смещение, байты, MIME-тип)
+IMAGE_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),
+]
+
+
+# Ширины уменьшенных копий, которые готовятся для каждого изображения
+RENDITION_WIDTHS = (100, 300, 600, 1200)
+
+RENDITION_MIME_TYPES = {
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+# Места вывода изображений в шаблонах: какие ширины попадают в srcset,
+# какой размер слота подсказать браузеру и можно ли грузить лениво
+IMAGE_SLOTS = {
+    'card': {'widths': (300, 600), 'sizes': '(max-width: 767px) 100vw, 300px', 'lazy': True},
+    'detail': {'widths': (600, 1200), 'sizes': '(max-width: 767px) 100vw, 50vw', 'lazy': False},
+    'related': {'widths': (300,), 'sizes': '(max-width: 767px) 50vw, 300px', 'lazy': True},
+    'thumb': {'widths': (100,), 'sizes': '100px', 'lazy': True},
+}
+
+
+def rendition_formats():
+    """Форматы уменьшенных копий, доступные в установленном Pillow"""
+    if features.check('webp'):
+        return ('jpeg', 'webp')
+    return ('jpeg',)
+
+
+def image_digest(data):
+    """Возвращает SHA-256 хеш содержимого изображения"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_with_digest(file):
+    """Читает файл по частям, одновременно считая хеш содержимого"""
+    hasher = hashlib.sha256()
+    chunks = []
+    for chunk in file.chunks():
+        hasher.update(chunk)
+        chunks.append(chunk)
+    return b''.join(chunks), hasher.hexdigest()
+
+
+def file_digest(storage, name):
+    """Считает хеш файла в хранилище, не держа его целиком в памяти"""
+    hasher = hashlib.sha256()
+    with storage.open(name, 'rb') as f:
+        for chunk in f.chunks():
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def image_sources():
+    """Поля с изображениями: (модель, поле с файлом, ссылка на StoredImage)"""
+    from .models import BankAccount, Category, Product
+
+    return [
+        (Product, 'image', 'stored_image'),
+        (Category, 'image', 'stored_image'),
+        (BankAccount, 'qr_code_image', 'stored_qr_code'),
+    ]
+
+
+def find_duplicate_file(storage, digest):
+    """Ищет в media уже сохраненный файл с таким же содержимым"""
+    for model, file_field, link_field in image_sources():
+        names = model.objects.filter(**{link_field: digest}).exclude(
+            **{file_field: ''}
+        ).values_list(file_field, flat=True).distinct()
+        for name in names:
+            # Файл могли заменить в обход save(), поэтому сверяем содержимое
+            try:
+                if file_digest(storage, name) == digest:
+                    return name
+            except OSError:
+                continue
+    return None
+
+
+def guess_mime_type(data):
+    """Определяет MIME-тип изображения по первым байтам"""
+    for offset, signature, mime_type in IMAGE_SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return mime_type
+    return 'application/octet-stream'
+
+
+def image_dimensions(data):
+    """Возвращает ширину и высоту изображения или (None, None)"""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def load_image(digest):
+    """Возвращает (байты, MIME-тип) изображения по хешу содержимого или None.
+
+    В памяти процесса оригиналы не держим: их размер ничем не ограничен,
+    а ответы по хешу и так кешируются браузером и прокси бессрочно.
+    """
+    from .models import StoredImage
+
+    row = StoredImage.objects.filter(digest=digest).values_list('data', 'mime_type').first()
+    if row is None:
+        return None
+    return bytes(row[0]), row[1]
+
+
+def _encode(image, fmt):
+    output = BytesIO()
+    if fmt == 'webp':
+        image.save(output, 'WEBP', quality=80, method=4)
+    else:
+        image.save(output, 'JPEG', quality=82, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def render_renditions(data, keys=None):
+    """Готовит уменьшенные копии изображения: список (ширина, формат, байты)
+
+    keys ограничивает набор пар (ширина, формат); по умолчанию готовятся все.
+    Исходник декодируется один раз, каждая следующая копия уменьшается
+    из предыдущей, более крупной.
+    """
+    if keys is None:
+        keys = {(width, fmt) for width in RENDITION_WIDTHS for fmt in rendition_formats()}
+    if not keys:
+        return []
+
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        renditions = []
+        for width in sorted({width for width, fmt in keys}, reverse=True):
+            # thumbnail сохраняет пропорции и не увеличивает маленькие изображения
+            image.thumbnail((width, width * 4), Image.LANCZOS)
+            for fmt in sorted(fmt for key_width, fmt in keys if key_width == width):
+                renditions.append((width, fmt, _encode(image, fmt)))
+        return renditions
+
+
+def prepare_image(path):
+    """Читает файл изображения и готовит все, что нужно сохранить в базу.
+
+    Не обращается к базе данных, поэтому подходит для пула процессов.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    width, height = image_dimensions(data)
+    try:
+        renditions = render_renditions(data)
+    except Exception:
+        # Файл, который не открывается в Pillow, сохраняем без копий
+        renditions = []
+    return {
+        'digest': image_digest(data),
+        'data': data,
+        'mime_type': guess_mime_type(data),
+        'width': width,
+        'height': height,
+        'renditions': renditions,
+    }
+
+
+def store_renditions(digest, data):
+    """Готовит все уменьшенные копии изображения, которых еще нет в базе"""
+    from .models import ImageRendition
+
+    existing = set(
+        ImageRendition.objects.filter(source_hash=digest).values_list('width', 'format')
+    )
+    missing = {
+        (width, fmt) for width in RENDITION_WIDTHS for fmt in rendition_formats()
+    } - existing
+    ImageRendition.objects.bulk_create([
+        ImageRendition(source_hash=digest, width=width, format=fmt, data=rendition)
+        for width, fmt, rendition in render_renditions(data, missing)
+    ], ignore_conflicts=True)
+
+
+_widths = {}
+
+
+def image_width(digest):
+    """Ширина сохраненного изображения; None - Pillow его не открывает и копий у него нет.
+
+    Ширина по хешу не меняется, поэтому держим ее в памяти процесса:
+    при первом обращении читаем все пары (хеш, ширина) одним запросом.
+    """
+    from .models import StoredImage
+
+    if digest not in _widths:
+        if not _widths:
+            _widths.update(StoredImage.objects.values_list('digest', 'width'))
+        if digest not in _widths:
+            _widths[digest] = StoredImage.objects.filter(digest=digest).values_list('width', flat=True).first()
+    return _widths[digest]
+
+
+def load_rendition(digest, width, fmt):
+    """Возвращает байты уменьшенной копии, при необходимости создавая ее"""
+    from .models import ImageRendition
+
+    if width not in RENDITION_WIDTHS or fmt not in rendition_formats():
+        return None
+
+    renditions = ImageRendition.objects.filter(source_hash=digest, width=width, format=fmt)
+    data = renditions.values_list('data', flat=True).first()
+    if data is None:
+        # Файл, который Pillow не открывает, хранится без копий: не разбираем его на каждый запрос
+        if image_width(digest) is None:
+            return None
+        # Изображения, загруженные до появления копий, обрабатываются при первом запросе
+        original = load_image(digest)
+        if original is None:
+            return None
+        try:
+            store_renditions(digest, original[0])
+        except Exception:
+            return None
+        data = renditions.values_list('data', flat=True).first()
+    return bytes(data) if data is not None else None
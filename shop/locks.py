@@ -0,0 +1,64 @@
+import os
+import tempfile
+import zlib
+from contextlib import contextmanager
+
+from django.db import connection
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def exclusive_lock(name, wait=True):
+    """Межпроцессная блокировка по имени.
+
+    В PostgreSQL используется advisory lock (работает между серверами),
+    для остальных БД - flock на файл во временной папке.
+    Отдает True, если блокировка взята сразу. Если ее держит другой процесс,
+    при wait=True дожидается его завершения и отдает False, при wait=False
+    сразу отдает False - в обоих случаях работу делать не нужно.
+    """
+    if connection.vendor == 'postgresql':
+        with _advisory_lock(name, wait) as acquired:
+            yield acquired
+    elif fcntl is not None:
+        with _file_lock(name, wait) as acquired:
+            yield acquired
+    else:
+        yield True
+
+
+@contextmanager
+def _advisory_lock(name, wait):
+    key = zlib.crc32(name.encode('utf-8'))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        acquired = cursor.fetchone()[0]
+        if not acquired and wait:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [key])
+    try:
+        yield acquired
+    finally:
+        if acquired or wait:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+
+@contextmanager
+def _file_lock(name, wait):
+    path = os.path.join(tempfile.gettempdir(), f'constr_store_{name}.lock')
+    with open(path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+            if wait:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield acquired
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
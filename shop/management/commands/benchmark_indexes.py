@@ -0,0 +1,164 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from shop.models import Category, Order, Product
+
+LOCAL_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+
+def is_local_database():
+    """SQLite или сервер БД на этой же машине (в том числе через unix-сокет)"""
+    if connection.vendor == 'sqlite':
+        return True
+    host = connection.settings_dict.get('HOST') or ''
+    return host in LOCAL_HOSTS or host.startswith('/')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает планы и время основных запросов каталога и дашборда '
+            'без составных индексов и с ними. Тестовые данные создаются '
+            'в транзакции, которая в конце откатывается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000,
+                            help='Сколько товаров создать')
+        parser.add_argument('--orders', type=int, default=50000,
+                            help='Сколько заказов создать')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз выполнять каждый запрос')
+        parser.add_argument('--force', action='store_true',
+                            help='Запустить на удаленной базе, например на копии боевой')
+
+    def handle(self, *args, **options):
+        # Индексы удаляются и создаются в транзакции: до ее конца таблицы заблокированы
+        if not is_local_database() and not options['force']:
+            raise CommandError(
+                f'База {connection.settings_dict.get("HOST")} не локальная: бенчмарк на все время '
+                'работы блокирует таблицы товаров и заказов. Запустите его на копии базы '
+                'или добавьте --force'
+            )
+        self.repeat = options['repeat']
+        with transaction.atomic():
+            started = time.monotonic()
+            self.seed(options['products'], options['orders'])
+            self.stdout.write(f'Тестовые данные созданы за {time.monotonic() - started:.1f} с')
+
+            self.set_indexes(enabled=False)
+            before = self.run_queries('Без индексов')
+            self.set_indexes(enabled=True)
+            after = self.run_queries('С индексами')
+
+            self.stdout.write(self.style.SUCCESS('\nИтог (медиана, мс):'))
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'  {name}: {before[name]:.2f} -> {after[name]:.2f} (x{speedup:.1f})')
+
+            # Ничего из созданного не должно остаться в базе
+            transaction.set_rollback(True)
+
+    def seed(self, product_count, order_count):
+        rng = random.Random(42)
+        categories = Category.objects.bulk_create([
+            Category(name=f'Бенчмарк {i}', slug=f'benchmark-{i}') for i in range(20)
+        ])
+        now = timezone.now()
+
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Товар {i}',
+                slug=f'benchmark-product-{i}',
+                description='Описание',
+                price=Decimal(rng.randint(10, 50000)),
+                stock=rng.randint(0, 100),
+                available=rng.random() > 0.1,
+                category=rng.choice(categories),
+            )
+            for i in range(product_count)
+        ], batch_size=1000)
+        # auto_now_add проставляет одну и ту же дату, разносим ее по времени
+        for product in products:
+            product.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        Product.objects.bulk_update(products, ['created_at'], batch_size=1000)
+
+        users = [
+            User.objects.create(username=f'benchmark-user-{i}') for i in range(50)
+        ]
+        statuses = [choice for choice, label in Order.STATUS_CHOICES]
+        payment_methods = [choice for choice, label in Order.PAYMENT_CHOICES]
+        orders = Order.objects.bulk_create([
+            Order(
+                user=rng.choice(users),
+                first_name='Имя', last_name='Фамилия', email='benchmark@example.com',
+                phone='0', address='Адрес', city='Бишкек',
+                status=rng.choice(statuses),
+                payment_method=rng.choice(payment_methods),
+                total_price=Decimal(rng.randint(100, 100000)),
+                qr_code=f'benchmark-{i}',
+            )
+            for i in range(order_count)
+        ], batch_size=1000)
+        for order in orders:
+            order.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        Order.objects.bulk_update(orders, ['created_at'], batch_size=1000)
+
+        self.category = categories[0]
+        self.user = users[0]
+        self.since = (now - timedelta(days=30)).date()
+
+    def queries(self):
+        return {
+            'Каталог, новинки': lambda: Product.objects.filter(available=True).order_by('-created_at', '-id')[:12],
+            'Каталог, по цене': lambda: Product.objects.filter(available=True).order_by('price', 'id')[:12],
+            'Категория, новинки': lambda: Product.objects.filter(
+                category=self.category, available=True
+            ).order_by('-created_at', '-id')[:12],
+            'Категория, по цене': lambda: Product.objects.filter(
+                category=self.category, available=True
+            ).order_by('price', 'id')[:12],
+            'Заказы пользователя': lambda: Order.objects.filter(user=self.user).order_by('-created_at')[:20],
+            'Дашборд, статусы за 30 дней': lambda: Order.objects.created_since(self.since).values(
+                'status'
+            ).annotate(count=Count('id'), total=Sum('total_price')).order_by(),
+            'Дашборд, способы оплаты за 30 дней': lambda: Order.objects.created_since(self.since).values(
+                'payment_method'
+            ).annotate(count=Count('id'), total=Sum('total_price')).order_by(),
+        }
+
+    def run_queries(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        results = {}
+        for name, build in self.queries().items():
+            plan = build().explain()
+            timings = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f'\n{name}: {results[name]:.2f} мс')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+        return results
+
+    def set_indexes(self, enabled):
+        """Удаляет или создает составные индексы из Meta.indexes внутри транзакции"""
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        with connection.cursor() as cursor:
+            for model in (Product, Order):
+                for index in model._meta.indexes:
+                    if enabled:
+                        statement = index.create_sql(model, editor)
+                    else:
+                        statement = index.remove_sql(model, editor)
+                    cursor.execute(str(statement))
+            # Обновляем статистику, чтобы планировщик учел новые данные и индексы
+            cursor.execute('ANALYZE')
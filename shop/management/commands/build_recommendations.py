@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop import recommendations
+from shop.cache import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = ('Обновляет рекомендации "с этим товаром покупают" по новым заказам. '
+            'Запускайте периодически, например раз в час по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать матрицу заново по всем заказам')
+        parser.add_argument('--top', type=int, default=recommendations.TOP_N,
+                            help='Сколько соседей хранить для каждого товара')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        run = recommendations.refresh(full=options['full'], top_n=options['top'])
+        if run is None:
+            self.stdout.write('Пересчет уже идет в другом процессе')
+            return
+        if run.products:
+            # Страницы товаров закешированы вместе со старыми рекомендациями
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Учтено заказов: {run.orders}, пересчитано товаров: {run.products}, '
+            f'последний заказ: {run.last_order_id}, {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from shop.images import file_digest, image_sources
+from shop.models import ImageRendition, StoredImage
+
+
+class Command(BaseCommand):
+    help = ('Убирает дубликаты изображений: одинаковые файлы в media и '
+            'записи StoredImage, на которые больше никто не ссылается')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        files_removed, file_bytes = self.dedupe_files(dry_run)
+        blobs_removed, blob_bytes = self.purge_orphans(dry_run)
+
+        prefix = 'Будет освобождено' if dry_run else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: файлов {files_removed} ({file_bytes / 1024 / 1024:.2f} МБ), '
+            f'изображений в базе {blobs_removed} ({blob_bytes / 1024 / 1024:.2f} МБ), '
+            f'всего {(file_bytes + blob_bytes) / 1024 / 1024:.2f} МБ'
+        ))
+
+    def dedupe_files(self, dry_run):
+        """Переключает записи с одинаковыми файлами на один файл, лишние удаляет"""
+        # Хеш считается один раз на имя файла, даже если на него ссылаются многие записи
+        digests = {}
+        rows = []
+        for model, file_field, link_field in image_sources():
+            storage = model._meta.get_field(file_field).storage
+            queryset = model.objects.exclude(**{file_field: ''}).order_by('pk')
+            for pk, name in queryset.values_list('pk', file_field).iterator():
+                if name not in digests:
+                    try:
+                        digests[name] = file_digest(storage, name)
+                    except OSError:
+                        digests[name] = None
+                        self.stderr.write(f'⚠️ Файл не найден: {name}')
+                rows.append((model, file_field, storage, pk, name))
+
+        # Первый встреченный файл с данным содержимым становится основным
+        canonical = {}
+        for name, digest in digests.items():
+            if digest is not None:
+                canonical.setdefault(digest, name)
+
+        updates = defaultdict(list)
+        redundant = {}
+        for model, file_field, storage, pk, name in rows:
+            digest = digests[name]
+            if digest is None or canonical[digest] == name:
+                continue
+            updates[(model, file_field)].append(model(pk=pk, **{file_field: canonical[digest]}))
+            redundant[name] = storage
+
+        reclaimed = sum(storage.size(name) for name, storage in redundant.items())
+        if dry_run:
+            return len(redundant), reclaimed
+
+        with transaction.atomic():
+            for (model, file_field), objs in updates.items():
+                model.objects.bulk_update(objs, [file_field], batch_size=500)
+        # Файлы удаляем только после того, как ссылки на них переключены
+        for name, storage in redundant.items():
+            storage.delete(name)
+        return len(redundant), reclaimed
+
+    def purge_orphans(self, dry_run):
+        """Удаляет изображения в базе, на которые не ссылается ни одна запись"""
+        orphans = StoredImage.objects.all()
+        for model, file_field, link_field in image_sources():
+            # NULL в подзапросе NOT IN отбросил бы все строки, поэтому исключаем их
+            orphans = orphans.exclude(digest__in=model.objects.filter(
+                **{f'{link_field}__isnull': False}
+            ).values(f'{link_field}_id'))
+
+        renditions = ImageRendition.objects.filter(source_hash__in=orphans.values('digest'))
+        reclaimed = (
+            (orphans.aggregate(total=Sum('size'))['total'] or 0)
+            + (renditions.aggregate(total=Sum(Length('data')))['total'] or 0)
+        )
+
+        count = orphans.count()
+        if not dry_run:
+            with transaction.atomic():
+                renditions.delete()
+                orphans.delete()
+        return count, reclaimed
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from shop.images import image_sources, prepare_image
+from shop.models import ImageRendition, StoredImage
+
+
+class Command(BaseCommand):
+    help = 'Переносит файлы изображений в базу данных пачками с помощью пула процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Сколько записей обрабатывать за одну пачку')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Количество процессов для чтения и обработки файлов')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.ingest_images.json'),
+                            help='Файл с последним обработанным ключом для продолжения после сбоя')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать заново, не учитывая сохраненную точку продолжения')
+        parser.add_argument('--force', action='store_true',
+                            help='Обработать и записи, у которых изображение уже в базе')
+
+    def handle(self, *args, **options):
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = {} if options['restart'] else self.load_checkpoint()
+        self.totals = {'rows': 0, 'bytes': 0, 'skipped': 0}
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for model, file_field, link_field in image_sources():
+                self.ingest_model(pool, model, file_field, link_field, options)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        megabytes = self.totals['bytes'] / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано изображений: {self.totals['rows']} ({megabytes:.1f} МБ), "
+            f"пропущено: {self.totals['skipped']}, время: {elapsed:.1f} с, "
+            f"{self.totals['rows'] / elapsed:.1f} изобр./с, {megabytes / elapsed:.2f} МБ/с"
+        ))
+
+        # Все дошли до конца - точка продолжения больше не нужна
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def ingest_model(self, pool, model, file_field, link_field, options):
+        label = model._meta.label
+        queryset = model.objects.exclude(**{file_field: ''}).exclude(**{f'{file_field}__isnull': True})
+        if not options['force']:
+            queryset = queryset.filter(**{f'{link_field}__isnull': True})
+
+        last_pk = self.checkpoint.get(label, 0)
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', file_field)[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            batch_started = time.monotonic()
+            storage = model._meta.get_field(file_field).storage
+            paths = [storage.path(name) for pk, name in batch]
+
+            prepared = {}
+            for (pk, name), result in zip(batch, pool.map(_safe_prepare, paths)):
+                if isinstance(result, Exception):
+                    self.totals['skipped'] += 1
+                    self.stderr.write(f"⚠️ {label} #{pk}: {name}: {result}")
+                    continue
+                prepared[pk] = result
+
+            self.save_batch(model, link_field, prepared)
+
+            last_pk = batch[-1][0]
+            self.checkpoint[label] = last_pk
+            self.save_checkpoint()
+
+            batch_bytes = sum(len(item['data']) for item in prepared.values())
+            self.totals['rows'] += len(prepared)
+            self.totals['bytes'] += batch_bytes
+            if options['verbosity'] > 1:
+                elapsed = max(time.monotonic() - batch_started, 1e-6)
+                self.stdout.write(
+                    f"{label}: до #{last_pk}, {len(prepared)} изобр. за {elapsed:.1f} с "
+                    f"({len(prepared) / elapsed:.1f} изобр./с)"
+                )
+
+    def save_batch(self, model, link_field, prepared):
+        """Записывает пачку: новые изображения, их копии и ссылки на них"""
+        if not prepared:
+            return
+        by_digest = {item['digest']: item for item in prepared.values()}
+
+        existing = set(StoredImage.objects.filter(digest__in=by_digest).values_list('digest', flat=True))
+        StoredImage.objects.bulk_create([
+            StoredImage(
+                digest=digest,
+                data=item['data'],
+                mime_type=item['mime_type'],
+                width=item['width'],
+                height=item['height'],
+                size=len(item['data']),
+            )
+            for digest, item in by_digest.items() if digest not in existing
+        ], ignore_conflicts=True)
+
+        with_renditions = set(
+            ImageRendition.objects.filter(source_hash__in=by_digest).values_list('source_hash', flat=True)
+        )
+        ImageRendition.objects.bulk_create([
+            ImageRendition(source_hash=digest, width=width, format=fmt, data=data)
+            for digest, item in by_digest.items() if digest not in with_renditions
+            for width, fmt, data in item['renditions']
+        ], ignore_conflicts=True)
+
+        model.objects.bulk_update(
+            [model(pk=pk, **{f'{link_field}_id': item['digest']}) for pk, item in prepared.items()],
+            [link_field],
+        )
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if checkpoint:
+            self.stdout.write(f"Продолжаем с сохраненной точки: {checkpoint}")
+        return checkpoint
+
+    def save_checkpoint(self):
+        # Пишем во временный файл и переименовываем, чтобы сбой не оставил битый JSON
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def _safe_prepare(path):
+    # Ошибку возвращаем, а не выбрасываем: иначе pool.map оборвет всю пачку
+    try:
+        return prepare_image(path)
+    except Exception as e:
+        return e
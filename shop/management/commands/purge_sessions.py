@@ -0,0 +1,124 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from shop.models import Cart, CartItem
+
+
+def table_size(model):
+    """Размер таблицы с индексами в байтах или None, если база его не сообщает"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            elif connection.vendor == 'sqlite':
+                # dbstat есть не в каждой сборке SQLite
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                    '(SELECT name FROM sqlite_master WHERE tbl_name = %s)', [table]
+                )
+            else:
+                return None
+        except Exception:
+            return None
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = ('Удаляет брошенные корзины анонимных посетителей и истекшие сессии '
+            'небольшими пачками по первичному ключу, чтобы не блокировать таблицы. '
+            'Запускайте периодически, например раз в час по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+        parser.add_argument('--days', type=int, default=settings.SESSION_COOKIE_AGE // 86400,
+                            help='Через сколько дней без изменений корзина считается брошенной')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько строк удалять одной транзакцией')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Пауза между пачками в секундах')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        self.batch_size = options['batch_size']
+        self.sleep = options['sleep']
+        self.dry_run = options['dry_run']
+
+        live_sessions = Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gt=now)
+        # Анонимные корзины теперь живут в сессии; в базе остались только старые.
+        # Брошенная - давно не менялась или ее сессия уже истекла
+        carts = Cart.objects.filter(user__isnull=True).filter(
+            Q(updated_at__lt=now - timedelta(days=options['days'])) | ~Exists(live_sessions)
+        )
+        sessions = Session.objects.filter(expire_date__lt=now)
+
+        report = [
+            self.purge('корзин', carts, Cart, children=(CartItem, 'cart')),
+            self.purge('сессий', sessions, Session),
+        ]
+
+        prefix = 'Будет удалено' if self.dry_run else 'Удалено'
+        lines = []
+        for label, rows, child_rows, size in report:
+            line = f'{label}: {rows}'
+            if child_rows is not None:
+                line += f' (позиций {child_rows})'
+            if size is not None:
+                line += f', ~{size / 1024 / 1024:.2f} МБ'
+            lines.append(line)
+        self.stdout.write(self.style.SUCCESS(f'{prefix}: ' + '; '.join(lines)))
+        if not self.dry_run and connection.vendor == 'sqlite':
+            self.stdout.write('Файл SQLite уменьшится только после VACUUM')
+
+    def batches(self, queryset):
+        """Первичные ключи queryset пачками по возрастанию; каждая пачка - отдельный запрос"""
+        last = None
+        queryset = queryset.order_by('pk').values_list('pk', flat=True)
+        while True:
+            batch = list((queryset if last is None else queryset.filter(pk__gt=last))[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+
+    def purge(self, label, queryset, model, children=None):
+        """Удаляет строки queryset пачками; (подпись, строк, дочерних строк, оценка места).
+
+        children - (модель, поле связи) строк, которые удаляются каскадом.
+        """
+        tables = [model] + ([children[0]] if children else [])
+        sizes = [(table, table_size(table), table.objects.count()) for table in tables]
+
+        removed = dict.fromkeys(tables, 0)
+        for batch in self.batches(queryset):
+            if self.dry_run:
+                removed[model] += len(batch)
+                if children:
+                    removed[children[0]] += children[0].objects.filter(**{f'{children[1]}__in': batch}).count()
+                continue
+            # Каждая пачка - отдельная короткая транзакция
+            with transaction.atomic():
+                deleted, per_model = model.objects.filter(pk__in=batch).delete()
+            for table in tables:
+                removed[table] += per_model.get(table._meta.label, 0)
+            if self.sleep:
+                time.sleep(self.sleep)
+
+        # Место оцениваем по доле удаленных строк в размере таблицы
+        reclaimed = 0
+        for table, size, total in sizes:
+            if size is None:
+                reclaimed = None
+                break
+            if total:
+                reclaimed += size * removed[table] // total
+
+        return label, removed[model], removed[children[0]] if children else None, reclaimed
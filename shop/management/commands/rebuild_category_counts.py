@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop import categories
+from shop.cache import bump_catalog_version
+from shop.models import Category
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает число товаров в категориях. Нужна после массовых '
+            'изменений товаров в обход save(), например через update()')
+
+    def handle(self, *args, **options):
+        categories.rebuild()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Счетчики пересчитаны, категорий: {Category.objects.count()}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from shop import ratings
+from shop.cache import bump_catalog_version
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает среднюю оценку и число оценок всех товаров по одобренным отзывам'
+
+    def handle(self, *args, **options):
+        ratings.rebuild()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Оценки пересчитаны, товаров с оценками: {Product.objects.filter(rating_count__gt=0).count()}'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop import search
+from shop.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс товаров'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write('Поисковый индекс для этой базы не используется')
+            return
+
+        with transaction.atomic():
+            search.clear_index()
+            search.index_products(Product.objects.order_by('pk'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Проиндексировано товаров: {Product.objects.count()}'
+        ))
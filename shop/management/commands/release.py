@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.locks import exclusive_lock
+from shop.models import ReleaseRun
+
+
+def release_done(release_id):
+    """Выполнены ли уже задачи релиза release_id"""
+    # До первых миграций таблицы релизов еще нет
+    if ReleaseRun._meta.db_table not in connection.introspection.table_names():
+        return False
+    return ReleaseRun.objects.filter(release_id=release_id).exists()
+
+
+class Command(BaseCommand):
+    help = ('Однократные задачи релиза: миграции и перенос изображений в базу. '
+            'Для каждого RELEASE_ID выполняются один раз')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-images', action='store_true',
+                            help='Не переносить изображения в базу')
+        parser.add_argument('--force', action='store_true',
+                            help='Выполнить задачи, даже если этот релиз уже выполнен')
+
+    def handle(self, *args, **options):
+        release_id = settings.RELEASE_ID
+        # Блокировка не дает запустить задачи одновременно, а запись о релизе -
+        # повторить их в процессе, который стартовал после того, как она снята
+        with exclusive_lock('release') as acquired:
+            if not acquired:
+                self.stdout.write('Задачи релиза уже выполнены другим процессом')
+                return
+            if release_id and not options['force'] and release_done(release_id):
+                self.stdout.write(f'Задачи релиза {release_id} уже выполнены')
+                return
+
+            started = time.monotonic()
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Миграции применены за {time.monotonic() - started:.1f} с'
+            ))
+
+            if not options['skip_images']:
+                started = time.monotonic()
+                call_command('ingest_images', verbosity=options['verbosity'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Изображения перенесены за {time.monotonic() - started:.1f} с'
+                ))
+
+            if release_id:
+                ReleaseRun.objects.get_or_create(release_id=release_id)
+            else:
+                self.stdout.write('RELEASE_ID не задан: задачи выполнятся снова при следующем запуске')
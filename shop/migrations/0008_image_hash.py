@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:30
+
+import base64
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_image_hash(apps, schema_editor):
+    """Считает хеш для уже сохраненных Base64 изображений"""
+    for model_name in ('Product', 'Category'):
+        model = apps.get_model('shop', model_name)
+        rows = model.objects.filter(image_data__isnull=False).exclude(image_data='')
+        for pk, image_data in rows.values_list('pk', 'image_data').iterator():
+            digest = hashlib.sha256(base64.b64decode(image_data)).hexdigest()
+            model.objects.filter(pk=pk).update(image_hash=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_bankaccount_qr_code_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Хеш изображения'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Хеш изображения'),
+        ),
+        migrations.RunPython(fill_image_hash, migrations.RunPython.noop),
+    ]
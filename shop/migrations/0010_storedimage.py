@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_imagerendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='Хеш содержимого')),
+                ('data', models.BinaryField(verbose_name='Данные')),
+                ('mime_type', models.CharField(max_length=50, verbose_name='MIME-тип')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер в байтах')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Сохраненное изображение',
+                'verbose_name_plural': 'Сохраненные изображения',
+            },
+        ),
+        migrations.AddField(
+            model_name='bankaccount',
+            name='stored_qr_code',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.storedimage', to_field='digest', verbose_name='QR-код в базе'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='stored_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.storedimage', to_field='digest', verbose_name='Изображение в базе'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stored_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.storedimage', to_field='digest', verbose_name='Изображение в базе'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+import base64
+import hashlib
+from io import BytesIO
+
+from django.db import migrations
+from PIL import Image
+
+
+# (модель, поле с Base64, ссылка на хранилище)
+IMAGE_FIELDS = [
+    ('Product', 'image_data', 'stored_image'),
+    ('Category', 'image_data', 'stored_image'),
+    ('BankAccount', 'qr_code_data', 'stored_qr_code'),
+]
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+
+def describe(data):
+    """MIME-тип и размеры изображения (без импорта кода приложения)"""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return MIME_TYPES.get(image.format, 'application/octet-stream'), image.width, image.height
+    except Exception:
+        return 'application/octet-stream', None, None
+
+
+def move_to_stored_images(apps, schema_editor):
+    """Переносит Base64 изображения в таблицу StoredImage, склеивая одинаковые"""
+    StoredImage = apps.get_model('shop', 'StoredImage')
+    for model_name, data_field, link_field in IMAGE_FIELDS:
+        model = apps.get_model('shop', model_name)
+        rows = model.objects.exclude(**{f'{data_field}__isnull': True}).exclude(**{data_field: ''})
+        for pk, encoded in rows.values_list('pk', data_field).iterator():
+            data = base64.b64decode(encoded)
+            digest = hashlib.sha256(data).hexdigest()
+            if not StoredImage.objects.filter(digest=digest).exists():
+                mime_type, width, height = describe(data)
+                StoredImage.objects.create(
+                    digest=digest, data=data, mime_type=mime_type,
+                    width=width, height=height, size=len(data),
+                )
+            model.objects.filter(pk=pk).update(**{f'{link_field}_id': digest})
+
+
+def restore_base64(apps, schema_editor):
+    """Возвращает изображения в Base64 поля"""
+    StoredImage = apps.get_model('shop', 'StoredImage')
+    for model_name, data_field, link_field in IMAGE_FIELDS:
+        model = apps.get_model('shop', model_name)
+        rows = model.objects.filter(**{f'{link_field}__isnull': False})
+        for pk, digest in rows.values_list('pk', f'{link_field}_id').iterator():
+            data = StoredImage.objects.filter(digest=digest).values_list('data', flat=True).first()
+            fields = {data_field: base64.b64encode(bytes(data)).decode('utf-8')}
+            if model_name != 'BankAccount':
+                fields['image_hash'] = digest
+            model.objects.filter(pk=pk).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_storedimage'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_stored_images, restore_base64),
+    ]
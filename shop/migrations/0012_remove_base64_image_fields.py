@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_move_images_to_storedimage'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='bankaccount',
+            name='qr_code_data',
+        ),
+        migrations.RemoveField(
+            model_name='category',
+            name='image_data',
+        ),
+        migrations.RemoveField(
+            model_name='category',
+            name='image_hash',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image_data',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image_hash',
+        ),
+    ]
@@ -0,0 +1,100 @@
+import re
+
+from django.db import migrations
+
+# Копия shop.search на момент миграции: миграция не должна меняться вместе с кодом приложения
+SQLITE_TABLE = 'shop_product_fts'
+POSTGRES_TABLE = 'shop_product_search'
+POSTGRES_CONFIG = 'russian'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-я]')
+_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ую', 'юю',
+    'ов', 'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ию', 'ия', 'ью', 'ым', 'им',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+], key=len, reverse=True)
+_MIN_STEM = 3
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not _CYRILLIC_RE.search(word):
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in _WORD_RE.findall(text or ''))
+
+
+def index_rows(rows, vendor, cursor):
+    """rows - кортежи (id товара, название, описание, название категории)"""
+    rows = list(rows)
+    if not rows:
+        return
+    if vendor == 'sqlite':
+        cursor.executemany(
+            f'INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+            [(pk, stem_text(name), stem_text(description), stem_text(category))
+             for pk, name, description, category in rows]
+        )
+    else:
+        cursor.executemany(
+            f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+            f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D'))",
+            [(pk, name or '', category or '', description or '')
+             for pk, name, description, category in rows]
+        )
+
+
+def create_search_index(apps, schema_editor):
+    """Создает таблицу поискового индекса под текущую базу и заполняет ее"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+            f"name, description, category, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {POSTGRES_TABLE} ("
+            f"product_id integer PRIMARY KEY REFERENCES shop_product (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {POSTGRES_TABLE}_document ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+    else:
+        return
+
+    Product = apps.get_model('shop', 'Product')
+    rows = Product.objects.values_list('id', 'name', 'description', 'category__name')
+    with schema_editor.connection.cursor() as cursor:
+        index_rows(rows.iterator(), vendor, cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_remove_base64_image_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:50
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_ratings(apps, schema_editor):
+    """Считает итоги по уже одобренным отзывам"""
+    Product = apps.get_model('shop', 'Product')
+    Review = apps.get_model('shop', 'Review')
+    totals = Review.objects.filter(approved=True).order_by().values('product_id').annotate(
+        count=Count('id'), total=Sum('rating')
+    )
+    products = [
+        Product(
+            pk=row['product_id'],
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            rating_avg=row['total'] / row['count'],
+        )
+        for row in totals
+    ]
+    Product.objects.bulk_update(products, ['rating_count', 'rating_sum', 'rating_avg'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False, verbose_name='Средняя оценка'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True)), fields=['-rating_avg', '-id'], name='product_avail_rating'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counts(apps, schema_editor):
+    """Считает товары уже существующих категорий"""
+    Category = apps.get_model('shop', 'Category')
+    Product = apps.get_model('shop', 'Product')
+    totals = Product.objects.order_by().values('category_id').annotate(
+        total=Count('id'), available=Count('id', filter=Q(available=True))
+    )
+    categories = [
+        Category(pk=row['category_id'], product_count=row['total'], available_count=row['available'])
+        for row in totals
+    ]
+    Category.objects.bulk_update(categories, ['product_count', 'available_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0016_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='available_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров в продаже'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Товаров'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
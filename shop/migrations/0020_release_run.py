@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReleaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('release_id', models.CharField(max_length=100, unique=True, verbose_name='Релиз')),
+                ('finished_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Релиз',
+                'verbose_name_plural': 'Релизы',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -1,17 +1,183 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 
+from .images import (
+    find_duplicate_file, guess_mime_type, image_digest, image_dimensions,
+    read_with_digest, store_renditions,
+)
+
+
+class BlobDeferringManager(models.Manager):
+    """Менеджер, который не загружает бинарные данные в обычных запросах.
+
+    Байты читаются только в shop.images при отдаче картинки;
+    при обращении к data у объекта поле догружается отдельным запросом.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('data')
+
+
+class StoredImage(models.Model):
+    """Изображение в базе данных: одна запись на уникальное содержимое"""
+    digest = models.CharField(max_length=64, unique=True, verbose_name="Хеш содержимого")
+    data = models.BinaryField(verbose_name="Данные")
+    mime_type = models.CharField(max_length=50, verbose_name="MIME-тип")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Ширина")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Высота")
+    size = models.PositiveIntegerField(verbose_name="Размер в байтах")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    objects = BlobDeferringManager()
+
+    class Meta:
+        verbose_name = "Сохраненное изображение"
+        verbose_name_plural = "Сохраненные изображения"
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.mime_type}, {self.size} байт)"
+
+    @classmethod
+    def store(cls, data, digest=None):
+        """Сохраняет байты изображения, переиспользуя запись с тем же хешем"""
+        digest = digest or image_digest(data)
+        # Уже известное изображение не нужно разбирать заново
+        existing = cls.objects.filter(digest=digest).first()
+        if existing is not None:
+            return existing
+
+        width, height = image_dimensions(data)
+        image, created = cls.objects.get_or_create(
+            digest=digest,
+            defaults={
+                'data': data,
+                'mime_type': guess_mime_type(data),
+                'width': width,
+                'height': height,
+                'size': len(data),
+            }
+        )
+        return image
+
+
+def ingest_upload(instance, file_field, link_field, renditions=True):
+    """Переносит новую загрузку в хранилище изображений до записи строки.
+
+    Загрузка читается один раз прямо из памяти или временного файла.
+    Если такой файл уже лежит в media, строка ссылается на него и
+    повторная запись файла не выполняется. Неизмененный файл (например,
+    при правке цены из списка в админке) не читается вовсе.
+    Возвращает True, если ссылка на изображение изменилась.
+    """
+    field_file = getattr(instance, file_field)
+    link_id = getattr(instance, f'{link_field}_id')
+
+    if not field_file:
+        # Изображение убрали - убираем и ссылку
+        if link_id is None:
+            return False
+        setattr(instance, link_field, None)
+        return True
+
+    if field_file._committed:
+        return False
+
+    try:
+        data, digest = read_with_digest(field_file)
+        duplicate = find_duplicate_file(field_file.storage, digest)
+        if duplicate:
+            # Одинаковое содержимое не пишем в media второй раз
+            field_file.name = duplicate
+            field_file._committed = True
+
+        if digest == link_id:
+            return False
+
+        setattr(instance, link_field, StoredImage.store(data, digest))
+        if renditions:
+            # Готовим уменьшенные копии для вывода в шаблонах
+            store_renditions(digest, data)
+        return True
+    except Exception as e:
+        print(f"Ошибка чтения изображения: {e}")
+        return False
+
+
+def _extend_update_fields(kwargs, *fields):
+    """Добавляет поля к update_fields, если сохраняется только часть полей"""
+    if kwargs.get('update_fields') is not None:
+        kwargs['update_fields'] = {*kwargs['update_fields'], *fields}
+
+
+def _without_fields(values, update_fields, names):
+    """Убирает поля names из UPDATE обычного save().
+
+    Их меняют только UPDATE с F-выражениями, и объект в памяти мог устареть.
+    Явно перечисленные в update_fields поля записываются как обычно.
+    """
+    if update_fields is not None:
+        return values
+    return [value for value in values if value[0].name not in names]
+
+
+def _updates_field(kwargs, field):
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or field in update_fields
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_category(self):
+        """Подгружает категорию тем же запросом"""
+        return self.select_related('category')
+
+
+class OrderQuerySet(models.QuerySet):
+    """Фильтры по дате создания через диапазон created_at.
+
+    created_at__date оборачивает столбец в функцию и не может использовать
+    индекс, а сравнение с началом дня - может.
+    """
+
+    @staticmethod
+    def _day_start(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def created_since(self, day):
+        return self.filter(created_at__gte=self._day_start(day))
+
+    def created_until(self, day):
+        return self.filter(created_at__lt=self._day_start(day + timedelta(days=1)))
+
+    def created_on(self, day):
+        return self.created_since(day).created_until(day)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name="Название категории")
     slug = models.SlugField(max_length=100, unique=True, verbose_name="URL")
     description = models.TextField(blank=True, verbose_name="Описание")
     image = models.ImageField(upload_to='categories/', blank=True, verbose_name="Изображение")
-    image_data = models.TextField(blank=True, null=True, verbose_name="Изображение в Base64")
+    stored_image = models.ForeignKey(
+        StoredImage, to_field='digest', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='+', verbose_name="Изображение в базе"
+    )
     # Test deploy - проверка что данные не исчезают
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # Меняется и когда в категории появляется или пропадает товар
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Счетчики ведет shop.categories при сохранении и удалении товаров
+    product_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Товаров")
+    available_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Товаров в продаже")
+
+    COUNT_FIELDS = ('product_count', 'available_count')
 
     class Meta:
         verbose_name = "Конставар"
@@ -24,37 +190,28 @@ class Category(models.Model):
     def get_absolute_url(self):
         return reverse('shop:category_detail', kwargs={'slug': self.slug})
 
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Счетчики товаров меняет только shop.categories: устаревший объект не должен их затереть
+        values = _without_fields(values, update_fields, self.COUNT_FIELDS)
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def save(self, *args, **kwargs):
-        # Сначала сохраняем объект чтобы получить файл
-        super().save(*args, **kwargs)
-        
-        # Затем конвертируем изображение в Base64
-        if self.image and hasattr(self.image, 'path'):
-            import base64
-            
-            try:
-                # Читаем сохраненный файл
-                with open(self.image.path, 'rb') as f:
-                    image_data = f.read()
-                
-                # Конвертируем в Base64
-                self.image_data = base64.b64encode(image_data).decode('utf-8')
-                
-                # Сохраняем только image_data поле
-                super().save(update_fields=['image_data'])
-            except Exception as e:
-                print(f"Ошибка чтения изображения: {e}")
-        
+        # Слаг и ссылку на изображение готовим заранее, чтобы записать строку один раз
         if not self.slug:
             self.slug = slugify(self.name)
-            super().save(update_fields=['slug'])
+            _extend_update_fields(kwargs, 'slug')
+
+        if _updates_field(kwargs, 'image') and ingest_upload(self, 'image', 'stored_image'):
+            _extend_update_fields(kwargs, 'stored_image')
+
+        super().save(*args, **kwargs)
     
     def get_image_url(self):
-        """Возвращает URL изображения или Base64 data URL"""
-        # Сначала проверяем Base64 данные
-        if self.image_data:
-            return f"data:image/jpeg;base64,{self.image_data}"
-        # Если Base64 нет, пробуем файл
+        """Возвращает кешируемый URL изображения по хешу содержимого"""
+        # Ключ связи и есть хеш, поэтому запрос к хранилищу не нужен
+        if self.stored_image_id:
+            return reverse('shop:image', kwargs={'digest': self.stored_image_id})
+        # Если изображения нет в базе, пробуем файл
         elif self.image and self.image.url:
             return self.image.url
         return None
@@ -69,14 +226,42 @@ class Product(models.Model):
     available = models.BooleanField(default=True, verbose_name="Доступен")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категория")
     image = models.ImageField(upload_to='products/', blank=True, verbose_name="Изображение")
-    image_data = models.TextField(blank=True, null=True, verbose_name="Изображение в Base64")
+    stored_image = models.ForeignKey(
+        StoredImage, to_field='digest', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='+', verbose_name="Изображение в базе"
+    )
+    # Итоги одобренных отзывов, обновляются в shop.ratings при каждом изменении отзыва
+    rating_avg = models.FloatField(default=0, editable=False, verbose_name="Средняя оценка")
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество оценок")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Сумма оценок")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['-created_at']
+        # Каталог показывает только доступные товары (иногда одной категории)
+        # и сортирует по дате, цене или названию; id завершает порядок курсора.
+        # Частичные индексы: условие available=True совпадает с фильтром запросов
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(available=True),
+                         name='product_avail_created'),
+            models.Index(fields=['price', 'id'], condition=models.Q(available=True),
+                         name='product_avail_price'),
+            models.Index(fields=['name', 'id'], condition=models.Q(available=True),
+                         name='product_avail_name'),
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(available=True),
+                         name='product_cat_avail_created'),
+            models.Index(fields=['category', 'price', 'id'], condition=models.Q(available=True),
+                         name='product_cat_avail_price'),
+            models.Index(fields=['-rating_avg', '-id'], condition=models.Q(available=True),
+                         name='product_avail_rating'),
+            # Выгрузка изменений через API: все товары, в том числе снятые с продажи
+            models.Index(fields=['updated_at', 'id'], name='product_updated'),
+        ]
 
     def __str__(self):
         return self.name
@@ -84,38 +269,30 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('shop:product_detail', kwargs={'slug': self.slug})
 
+    RATING_FIELDS = ('rating_avg', 'rating_count', 'rating_sum')
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # Итоги оценок меняет только shop.ratings: устаревший объект не должен их затереть
+        values = _without_fields(values, update_fields, self.RATING_FIELDS)
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
     def save(self, *args, **kwargs):
-        # Сначала сохраняем объект чтобы получить файл
-        super().save(*args, **kwargs)
-        
-        # Затем конвертируем изображение в Base64
-        if self.image and hasattr(self.image, 'path'):
-            from django.core.files.base import ContentFile
-            import base64
-            
-            try:
-                # Читаем сохраненный файл
-                with open(self.image.path, 'rb') as f:
-                    image_data = f.read()
-                
-                # Конвертируем в Base64
-                self.image_data = base64.b64encode(image_data).decode('utf-8')
-                
-                # Сохраняем только image_data поле
-                super().save(update_fields=['image_data'])
-            except Exception as e:
-                print(f"Ошибка чтения изображения: {e}")
-        
+        # Слаг и ссылку на изображение готовим заранее, чтобы записать строку один раз
         if not self.slug:
             self.slug = slugify(self.name)
-            super().save(update_fields=['slug'])
+            _extend_update_fields(kwargs, 'slug')
+
+        if _updates_field(kwargs, 'image') and ingest_upload(self, 'image', 'stored_image'):
+            _extend_update_fields(kwargs, 'stored_image')
+
+        super().save(*args, **kwargs)
     
     def get_image_url(self):
-        """Возвращает URL изображения или Base64 data URL"""
-        # Сначала проверяем Base64 данные
-        if self.image_data:
-            return f"data:image/jpeg;base64,{self.image_data}"
-        # Если Base64 нет, пробуем файл
+        """Возвращает кешируемый URL изображения по хешу содержимого"""
+        # Ключ связи и есть хеш, поэтому запрос к хранилищу не нужен
+        if self.stored_image_id:
+            return reverse('shop:image', kwargs={'digest': self.stored_image_id})
+        # Если изображения нет в базе, пробуем файл
         elif self.image and self.image.url:
             return self.image.url
         return None
@@ -125,12 +302,55 @@ class Product(models.Model):
         return self.stock > 0 and self.available
 
 
+class ImageRendition(models.Model):
+    """Уменьшенная копия изображения товара или категории"""
+    FORMAT_CHOICES = [
+        ('jpeg', 'JPEG'),
+        ('webp', 'WebP'),
+    ]
+
+    source_hash = models.CharField(max_length=64, verbose_name="Хеш исходного изображения")
+    width = models.PositiveIntegerField(verbose_name="Ширина")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Формат")
+    data = models.BinaryField(verbose_name="Данные")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    objects = BlobDeferringManager()
+
+    class Meta:
+        verbose_name = "Копия изображения"
+        verbose_name_plural = "Копии изображений"
+        unique_together = ['source_hash', 'width', 'format']
+
+    def __str__(self):
+        return f"{self.source_hash[:12]} {self.width}px {self.format}"
+
+
+def _money_sum(expression):
+    return Coalesce(
+        models.Sum(expression, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        models.Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Число товаров и сумма корзины тем же запросом"""
+        return self.annotate(
+            items_count=Coalesce(models.Sum('items__quantity'), models.Value(0)),
+            items_total=_money_sum(models.F('items__quantity') * models.F('items__product__price')),
+        )
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_key = models.CharField(max_length=40, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Корзина"
         verbose_name_plural = "Корзины"
@@ -138,16 +358,73 @@ class Cart(models.Model):
     def __str__(self):
         return f"Корзина {self.user.username if self.user else self.session_key}"
 
+    @cached_property
+    def totals(self):
+        """(число товаров, сумма) одним агрегатным запросом или из with_totals()"""
+        if hasattr(self, 'items_total'):
+            return self.items_count, self.items_total
+        result = self.items.aggregate(
+            count=Coalesce(models.Sum('quantity'), models.Value(0)),
+            total=_money_sum(models.F('quantity') * models.F('product__price')),
+        )
+        return result['count'], result['total']
+
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.totals[1]
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals[0]
+
+    def lines(self):
+        """Позиции корзины с товарами и категориями одним запросом"""
+        return list(self.items.select_related('product__category').order_by('created_at', 'id'))
+
+    def add(self, product, quantity=1, override=False):
+        """Добавляет товар; override - заменить количество, а не прибавить"""
+        self.update({product.pk: (quantity, not override)})
+
+    def update(self, changes):
+        """Применяет пачку изменений {id товара: (количество, прибавить ли)}.
+
+        Текущие количества читаются одним запросом, новые и измененные
+        позиции пишутся одним upsert, позиции с количеством 0 и меньше
+        удаляются. Возвращает {id товара: новое количество}.
+        """
+        with transaction.atomic():
+            current = dict(
+                self.items.select_for_update().filter(product__in=list(changes)).values_list('product_id', 'quantity')
+            )
+            quantities = {
+                pk: min(max(current.get(pk, 0) + quantity if relative else quantity, 0), CartItem.MAX_QUANTITY)
+                for pk, (quantity, relative) in changes.items()
+            }
+            CartItem.objects.bulk_create(
+                [CartItem(cart=self, product_id=pk, quantity=quantity) for pk, quantity in quantities.items() if quantity],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+            removed = [pk for pk, quantity in quantities.items() if not quantity and pk in current]
+            if removed:
+                self.items.filter(product__in=removed).delete()
+        self.__dict__.pop('totals', None)
+        return quantities
+
+    def remove(self, product):
+        self.items.filter(product=product).delete()
+        self.__dict__.pop('totals', None)
+
+    def clear(self):
+        self.items.all().delete()
+        self.__dict__.pop('totals', None)
 
 
 class CartItem(models.Model):
+    # Больше одной позиции не продать; заодно защищает столбец quantity от переполнения
+    MAX_QUANTITY = 10000
+
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
@@ -196,10 +473,20 @@ class Order(models.Model):
     qr_code = models.CharField(max_length=50, unique=True, blank=True, null=True, verbose_name="QR-код")
     qr_payment_data = models.TextField(blank=True, null=True, verbose_name="Данные для QR-оплаты")
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_at']
+        indexes = [
+            # Список заказов пользователя
+            models.Index(fields=['user', '-created_at'], name='order_user_created'),
+            # Отчеты дашборда: диапазон дат с группировкой по статусу и способу оплаты
+            models.Index(fields=['created_at', 'status', 'payment_method', 'total_price'], name='order_created_stats'),
+            # Фильтр заказов по статусу в дашборде
+            models.Index(fields=['status', '-created_at'], name='order_status_created'),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id} - {self.user.username}"
@@ -250,7 +537,10 @@ class BankAccount(models.Model):
     bank_name = models.CharField(max_length=100, verbose_name="Название банка")
     account_number = models.CharField(max_length=50, verbose_name="Номер счета")
     qr_code_image = models.ImageField(upload_to='qr_codes/', verbose_name="QR-код счета")
-    qr_code_data = models.TextField(blank=True, null=True, verbose_name="QR-код в Base64")
+    stored_qr_code = models.ForeignKey(
+        StoredImage, to_field='digest', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='+', verbose_name="QR-код в базе"
+    )
     is_active = models.BooleanField(default=True, verbose_name="Активен")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
 
@@ -267,32 +557,19 @@ class BankAccount(models.Model):
         return cls.objects.filter(is_active=True).first()
 
     def save(self, *args, **kwargs):
-        # Сначала сохраняем объект чтобы получить файл
+        # QR-код переносим в базу до записи строки, чтобы сохранить ее один раз
+        if _updates_field(kwargs, 'qr_code_image') and ingest_upload(
+            self, 'qr_code_image', 'stored_qr_code', renditions=False
+        ):
+            _extend_update_fields(kwargs, 'stored_qr_code')
+
         super().save(*args, **kwargs)
-        
-        # Затем конвертируем QR-код в Base64
-        if self.qr_code_image and hasattr(self.qr_code_image, 'path'):
-            import base64
-            
-            try:
-                # Читаем сохраненный файл
-                with open(self.qr_code_image.path, 'rb') as f:
-                    qr_data = f.read()
-                
-                # Конвертируем в Base64
-                self.qr_code_data = base64.b64encode(qr_data).decode('utf-8')
-                
-                # Сохраняем только qr_code_data поле
-                super().save(update_fields=['qr_code_data'])
-            except Exception as e:
-                print(f"Ошибка чтения QR-кода: {e}")
     
     def get_qr_url(self):
-        """Возвращает URL QR-кода или Base64 data URL"""
-        # Сначала проверяем Base64 данные
-        if self.qr_code_data:
-            return f"data:image/png;base64,{self.qr_code_data}"
-        # Если Base64 нет, пробуем файл
+        """Возвращает кешируемый URL QR-кода"""
+        if self.stored_qr_code_id:
+            return reverse('shop:image', kwargs={'digest': self.stored_qr_code_id})
+        # Если QR-кода нет в базе, пробуем файл
         elif self.qr_code_image and self.qr_code_image.url:
             return self.qr_code_image.url
         return None
@@ -304,6 +581,7 @@ class Review(models.Model):
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)], verbose_name="Оценка")
     text = models.TextField(verbose_name="Текст отзыва")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     approved = models.BooleanField(default=False, verbose_name="Одобрен")
 
     class Meta:
@@ -314,3 +592,64 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Отзыв {self.user.username} на {self.product.name}"
+
+
+class ProductPairCount(models.Model):
+    """Разреженная матрица совместных покупок.
+
+    orders - число заказов, где есть оба товара; строка с product == other
+    хранит число заказов с самим товаром. Матрица симметрична.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0, verbose_name="Заказов")
+
+    class Meta:
+        verbose_name = "Совместные покупки"
+        verbose_name_plural = "Совместные покупки"
+        unique_together = ['product', 'other']
+
+
+class ProductRecommendation(models.Model):
+    """Готовый список "с этим товаром покупают" для страницы товара"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    position = models.PositiveSmallIntegerField(verbose_name="Позиция")
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Рекомендация"
+        verbose_name_plural = "Рекомендации"
+        unique_together = ['product', 'position']
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} ({self.score:.2f})"
+
+
+class RecommendationRun(models.Model):
+    """Запуск пересчета рекомендаций; last_order_id - до какого заказа учтены покупки"""
+    last_order_id = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0, verbose_name="Новых заказов")
+    products = models.PositiveIntegerField(default=0, verbose_name="Пересчитано товаров")
+    full = models.BooleanField(default=False, verbose_name="Полный пересчет")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Пересчет рекомендаций"
+        verbose_name_plural = "Пересчеты рекомендаций"
+        ordering = ['-id']
+
+
+class ReleaseRun(models.Model):
+    """Выполненные задачи релиза: по одной записи на RELEASE_ID"""
+    release_id = models.CharField(max_length=100, unique=True, verbose_name="Релиз")
+    finished_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Релиз"
+        verbose_name_plural = "Релизы"
+        ordering = ['-id']
+
+    def __str__(self):
+        return self.release_id
@@ -0,0 +1,83 @@
+"""Оформление заказа.
+
+Заказ, его позиции, списание остатков и очистка корзины выполняются в одной
+транзакции: либо заказ создан целиком, либо ничего не изменилось. Остаток
+списывается условным UPDATE "stock = stock - n WHERE stock >= n", поэтому
+два покупателя не могут купить последний товар дважды: второй UPDATE не
+найдет строку, и его заказ откатится с ошибкой OutOfStock.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Cart, CartItem, Order, OrderItem, Product
+
+
+class EmptyCart(Exception):
+    """В корзине нет позиций"""
+
+
+class OutOfStock(Exception):
+    """Каких товаров не хватило: [(товар, сколько осталось, в продаже ли)]"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(
+            f'{product.name} ({f"осталось {stock}" if available else "нет в продаже"})'
+            for product, stock, available in shortages
+        ))
+
+
+def place_order(user, cart, **fields):
+    """Создает заказ из корзины cart и убирает из нее заказанные позиции.
+
+    fields - поля заказа (адрес, телефон и т.д.). Позиции и цены читаются
+    уже внутри транзакции под блокировкой корзины. Если корзина пуста,
+    бросает EmptyCart, если какого-то товара не хватает - OutOfStock;
+    в обоих случаях в базе ничего не меняется.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Пока заказ оформляется, другой заказ из этой же корзины ждет
+        Cart.objects.select_for_update().get(pk=cart.pk)
+        # Строки товаров блокируются в одном порядке - параллельные заказы не ждут друг друга по кругу
+        lines = list(
+            cart.items.select_for_update(of=('self',)).select_related('product').order_by('product_id')
+        )
+        if not lines:
+            raise EmptyCart()
+
+        order = Order.objects.create(
+            user=user,
+            total_price=sum(line.product.price * line.quantity for line in lines),
+            **fields
+        )
+
+        shortages = []
+        for line in lines:
+            updated = Product.objects.filter(
+                pk=line.product_id, available=True, stock__gte=line.quantity
+            ).update(stock=F('stock') - line.quantity, updated_at=now)
+            if not updated:
+                shortages.append(line.product)
+        if shortages:
+            state = {
+                pk: (stock, available) for pk, stock, available in
+                Product.objects.filter(pk__in=[product.pk for product in shortages]).values_list('pk', 'stock', 'available')
+            }
+            # Исключение откатывает транзакцию вместе с уже списанными остатками
+            raise OutOfStock([(product, *state.get(product.pk, (0, False))) for product in shortages])
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=line.product_id, quantity=line.quantity, price=line.product.price)
+            for line in lines
+        ])
+        # Позиции, добавленные после чтения корзины, остаются в ней
+        CartItem.objects.filter(pk__in=[line.pk for line in lines]).delete()
+        # Остатки показываются на закешированных страницах каталога
+        transaction.on_commit(bump_catalog_version)
+
+    cart.__dict__.pop('totals', None)
+    return order
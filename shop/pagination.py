@@ -0,0 +1,170 @@
+"""Постраничный вывод по курсору (keyset pagination).
+
+Вместо OFFSET и COUNT(*) страница выбирается условием "после последней
+записи предыдущей страницы" по столбцам сортировки и id. Поэтому любая
+страница стоит столько же, сколько первая.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.http import QueryDict
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _parse_ordering(ordering):
+    fields = []
+    for name in ordering:
+        if not isinstance(name, str):
+            raise ValueError('Курсор поддерживает сортировку только по именам полей')
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        fields.append(('id' if name == 'pk' else name, descending))
+    # Для однозначного порядка последним всегда идет id
+    if 'id' not in {name for name, descending in fields}:
+        fields.append(('id', fields[0][1] if fields else False))
+    return fields
+
+
+class CursorPage:
+    """Страница результатов со ссылками на соседние страницы"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query(self, cursor):
+        query = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        query['cursor'] = cursor
+        return query.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor) if self.has_previous else ''
+
+
+class CursorPaginator:
+    """Делит queryset на страницы по курсору.
+
+    Порядок берется из queryset (или из Meta.ordering модели); сортировать
+    можно по полям модели и по аннотациям.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        self.fields = _parse_ordering(ordering)
+
+    def get_page(self, cursor=None, params=None):
+        """Возвращает страницу по курсору; неверный курсор означает первую страницу"""
+        try:
+            position = self.decode(cursor) if cursor else None
+        except InvalidCursor:
+            position = None
+
+        queryset = self.queryset.order_by(*self._order(reverse=False))
+        if position is None:
+            rows = list(queryset[:self.per_page + 1])
+            has_more, has_before = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            values, backwards = position
+            if backwards:
+                queryset = queryset.order_by(*self._order(reverse=True))
+            rows = list(queryset.filter(self._after(values, reverse=backwards))[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            if backwards:
+                rows.reverse()
+                # Назад шли от существующей записи, значит, впереди есть страница
+                has_more, has_before = True, has_more
+            else:
+                has_before = True
+
+        next_cursor = self.encode(rows[-1], backwards=False) if rows and has_more else None
+        previous_cursor = self.encode(rows[0], backwards=True) if rows and has_before else None
+        return CursorPage(rows, next_cursor, previous_cursor, params)
+
+    def _order(self, reverse):
+        return [
+            f"{'-' if descending != reverse else ''}{name}"
+            for name, descending in self.fields
+        ]
+
+    def _after(self, values, reverse):
+        """Условие "строго после" позиции: (a > x) or (a = x and b > y) or ..."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(f'Неизвестное поле сортировки: {name}')
+
+    def encode(self, obj, backwards):
+        values = []
+        for name, descending in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            raw_values, backwards = payload['v'], bool(payload['b'])
+            if len(raw_values) != len(self.fields):
+                raise InvalidCursor('Курсор не подходит к сортировке')
+            values = [
+                self._field(name).to_python(value)
+                for (name, descending), value in zip(self.fields, raw_values)
+            ]
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            raise InvalidCursor(f'Некорректный курсор: {e}')
+        return values, backwards
@@ -0,0 +1,89 @@
+"""Средняя оценка товара по одобренным отзывам.
+
+Итоги хранятся прямо в Product (rating_sum, rating_count, rating_avg),
+чтобы каталог мог сортировать и фильтровать по оценке без JOIN.
+Каждое изменение - один UPDATE с F-выражениями, без пересчета всех отзывов.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Product, Review
+
+
+def _average(rating_sum, rating_count):
+    # Выражения вычисляются по старым значениям строки, как и весь UPDATE
+    return Cast(rating_sum, FloatField()) / Cast(rating_count, FloatField())
+
+
+def apply_delta(product_id, count_delta, sum_delta):
+    """Прибавляет к итогам товара изменение числа и суммы одобренных оценок"""
+    if not count_delta and not sum_delta:
+        return
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+    Product.objects.filter(pk=product_id).update(
+        # Оценка видна на странице товара, поэтому это тоже изменение товара
+        updated_at=timezone.now(),
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(GreaterThan(new_count, 0), then=_average(new_sum, new_count)),
+            default=Value(0.0),
+            output_field=FloatField()
+        ),
+    )
+
+
+def review_state(review):
+    """(одобрен, оценка, товар) отзыва - то, от чего зависят итоги"""
+    return review.approved, review.rating, review.product_id
+
+
+def apply_change(old_state, new_state):
+    """Обновляет итоги по разнице между прежним и новым состоянием отзыва"""
+    if old_state == new_state:
+        return
+    if old_state and old_state[0]:
+        apply_delta(old_state[2], -1, -old_state[1])
+    if new_state and new_state[0]:
+        apply_delta(new_state[2], 1, new_state[1])
+
+
+def set_approved(queryset, approved):
+    """Массово одобряет или отклоняет отзывы, обновляя итоги товаров"""
+    with transaction.atomic():
+        changed = queryset.exclude(approved=approved)
+        deltas = list(
+            changed.order_by().values('product_id').annotate(count=Count('id'), total=Sum('rating'))
+        )
+        updated = changed.update(approved=approved, updated_at=timezone.now())
+        sign = 1 if approved else -1
+        for row in deltas:
+            apply_delta(row['product_id'], sign * row['count'], sign * row['total'])
+        # update() не отправляет сигналы; кеш сбрасываем сами, когда изменения видны другим
+        transaction.on_commit(bump_catalog_version)
+    return updated
+
+
+def rebuild():
+    """Пересчитывает итоги всех товаров по таблице отзывов"""
+    approved = Review.objects.filter(product=OuterRef('pk'), approved=True).order_by().values('product')
+    rating_count = Coalesce(
+        Subquery(approved.annotate(value=Count('id')).values('value'), output_field=IntegerField()),
+        Value(0)
+    )
+    rating_sum = Coalesce(
+        Subquery(approved.annotate(value=Sum('rating')).values('value'), output_field=IntegerField()),
+        Value(0)
+    )
+    with transaction.atomic():
+        Product.objects.update(rating_count=rating_count, rating_sum=rating_sum)
+        Product.objects.update(rating_avg=Case(
+            When(rating_count__gt=0, then=_average(F('rating_sum'), F('rating_count'))),
+            default=Value(0.0),
+            output_field=FloatField()
+        ))
@@ -0,0 +1,185 @@
+"""Рекомендации "с этим товаром покупают".
+
+Матрица совместных покупок хранится разреженно в ProductPairCount. Пакетная
+задача refresh() добавляет в нее только заказы после прошлого запуска и
+пересчитывает первые TOP_N соседей для товаров, которых эти заказы касаются.
+Страница товара читает готовый список одним запросом по индексу
+(product, position).
+
+Сходство - косинусная мера: заказов с обоими товарами, деленное на
+sqrt(заказов с первым * заказов со вторым). Счетчики только растут, поэтому
+новый заказ меняет списки лишь у товаров из него и у тех, в чьих списках
+эти товары уже стоят - их и пересчитываем.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .locks import exclusive_lock
+from .models import Order, OrderItem, ProductPairCount, ProductRecommendation, RecommendationRun
+
+TOP_N = 8
+# id заказа выдается до коммита: заказ с меньшим id может появиться позже заказа
+# с большим и остаться за last_order_id. Свежие заказы берем в следующий раз
+SETTLE_DELAY = timedelta(minutes=10)
+# Ограничение на число параметров в IN (...) у SQLite
+CHUNK_SIZE = 500
+
+PAIR_COLUMNS = ['product', 'other', 'orders']
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def _pair_frame(queryset):
+    rows = list(queryset.values_list('product_id', 'other_id', 'orders'))
+    return pd.DataFrame.from_records(rows, columns=PAIR_COLUMNS)
+
+
+def order_items(orders):
+    """Пары (order, product) без повторов: количество товара в заказе не важно"""
+    rows = OrderItem.objects.filter(order__in=orders).values_list('order_id', 'product_id')
+    frame = pd.DataFrame.from_records(list(rows), columns=['order', 'product'])
+    return frame.drop_duplicates()
+
+
+def co_occurrence(items):
+    """Матрица совместных покупок по позициям заказов, включая диагональ"""
+    pairs = items.merge(items, on='order', suffixes=('', '_other'))
+    counts = pairs.groupby(['product', 'product_other'], sort=False).size()
+    frame = counts.reset_index()
+    frame.columns = PAIR_COLUMNS
+    return frame
+
+
+def add_counts(delta):
+    """Прибавляет delta к сохраненной матрице одним upsert на пачку товаров"""
+    for products in _chunks(delta['product'].unique()):
+        part = delta[delta['product'].isin(products)]
+        stored = _pair_frame(ProductPairCount.objects.filter(product__in=products))
+        merged = pd.concat([stored, part]).groupby(['product', 'other'], sort=False)['orders'].sum()
+        ProductPairCount.objects.bulk_create(
+            [
+                ProductPairCount(product_id=int(product), other_id=int(other), orders=int(orders))
+                for (product, other), orders in merged.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['product', 'other'],
+            update_fields=['orders'],
+        )
+
+
+def top_neighbours(products, top_n=TOP_N):
+    """Первые top_n соседей для товаров products по сохраненной матрице"""
+    pairs = pd.concat(
+        [_pair_frame(ProductPairCount.objects.filter(product__in=chunk)) for chunk in _chunks(products)]
+        or [pd.DataFrame(columns=PAIR_COLUMNS)],
+        ignore_index=True,
+    )
+    if pairs.empty:
+        return pd.DataFrame(columns=['product', 'other', 'score', 'position'])
+
+    diagonal = pd.concat(
+        [
+            _pair_frame(ProductPairCount.objects.filter(product__in=chunk, other=F('product')))
+            for chunk in _chunks(pairs['other'].unique())
+        ],
+        ignore_index=True,
+    )
+    totals = diagonal.set_index('product')['orders']
+
+    pairs = pairs[pairs['product'] != pairs['other']]
+    own = pairs['product'].map(totals).to_numpy(dtype=float)
+    others = pairs['other'].map(totals).to_numpy(dtype=float)
+    pairs = pairs.assign(score=pairs['orders'].to_numpy(dtype=float) / np.sqrt(own * others))
+
+    pairs = pairs.sort_values(['product', 'score', 'orders', 'other'], ascending=[True, False, False, True])
+    top = pairs.groupby('product', sort=False).head(top_n)
+    return top.assign(position=top.groupby('product', sort=False).cumcount())
+
+
+def store_recommendations(products, top_n=TOP_N):
+    """Перезаписывает списки рекомендаций товаров products"""
+    products = list(products)
+    top = top_neighbours(products, top_n)
+    for chunk in _chunks(products):
+        ProductRecommendation.objects.filter(product__in=chunk).delete()
+    ProductRecommendation.objects.bulk_create(
+        [
+            ProductRecommendation(
+                product_id=int(row.product),
+                recommended_id=int(row.other),
+                position=int(row.position),
+                score=float(row.score),
+            )
+            for row in top.itertuples(index=False)
+        ],
+        batch_size=1000,
+    )
+
+
+def refresh(full=False, top_n=TOP_N):
+    """Учитывает новые заказы и обновляет затронутые списки.
+
+    full=True строит матрицу заново по всем заказам - например, после
+    отмены заказов, которые уже были учтены. Если пересчет уже идет в
+    другом процессе, ничего не делает и возвращает None: два пересчета
+    учли бы одни и те же заказы дважды.
+    """
+    with exclusive_lock('recommendations', wait=False) as acquired:
+        if not acquired:
+            return None
+        return _refresh(full, top_n)
+
+
+def _refresh(full, top_n):
+    with transaction.atomic():
+        if full:
+            ProductPairCount.objects.all().delete()
+            ProductRecommendation.objects.all().delete()
+            last_order_id = 0
+        else:
+            last_order_id = RecommendationRun.objects.values_list('last_order_id', flat=True).first() or 0
+
+        pending = Order.objects.filter(id__gt=last_order_id, created_at__lt=timezone.now() - SETTLE_DELAY)
+        new_last_order_id = pending.aggregate(last=Max('id'))['last'] or last_order_id
+        orders = pending.filter(id__lte=new_last_order_id).exclude(status='cancelled')
+
+        items = order_items(orders.values('id'))
+        touched = [int(product) for product in items['product'].unique()]
+        if touched:
+            add_counts(co_occurrence(items))
+
+        # Соседи, чьи списки ссылаются на затронутые товары, тоже могут измениться
+        targets = set(touched)
+        for chunk in _chunks(touched):
+            targets.update(
+                ProductRecommendation.objects.filter(recommended__in=chunk).values_list('product_id', flat=True)
+            )
+        if targets:
+            store_recommendations(targets, top_n)
+
+        return RecommendationRun.objects.create(
+            last_order_id=new_last_order_id,
+            orders=items['order'].nunique(),
+            products=len(targets),
+            full=full,
+        )
+
+
+def recommended_products(product, limit=4):
+    """Товары, которые чаще всего покупают вместе с product"""
+    recommendations = (
+        product.recommendations
+        .filter(recommended__available=True)
+        .select_related('recommended')[:limit]
+    )
+    return [recommendation.recommended for recommendation in recommendations]
@@ -0,0 +1,171 @@
+"""Полнотекстовый поиск товаров.
+
+Индекс хранится в отдельной таблице рядом с shop_product:
+в SQLite это виртуальная таблица FTS5, в PostgreSQL - tsvector с GIN-индексом.
+Индекс обновляется сигналами при сохранении и удалении товара.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, FloatField, Q, When
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = 'shop_product_fts'
+POSTGRES_TABLE = 'shop_product_search'
+# Конфигурация PostgreSQL со стеммером для русского языка
+POSTGRES_CONFIG = 'russian'
+
+# Вес совпадений по полям: название важнее категории, категория важнее описания
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-я]')
+
+# Окончания существительных и прилагательных, от длинных к коротким
+_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ую', 'юю',
+    'ов', 'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ию', 'ия', 'ью', 'ым', 'им',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+], key=len, reverse=True)
+# Короче этого основу не обрезаем, иначе разные слова начнут совпадать
+_MIN_STEM = 3
+
+
+def stem(word):
+    """Упрощенный стеммер: отбрасывает падежное окончание русского слова"""
+    word = word.lower().replace('ё', 'е')
+    if not _CYRILLIC_RE.search(word):
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def words(text):
+    return _WORD_RE.findall(text or '')
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in words(text))
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def index_rows(rows, cursor=None):
+    """Добавляет или обновляет записи индекса.
+
+    rows - кортежи (id товара, название, описание, название категории).
+    """
+    rows = list(rows)
+    if not rows or not is_supported():
+        return
+
+    def run(cursor):
+        if connection.vendor == 'sqlite':
+            cursor.executemany(
+                f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) '
+                f'VALUES (%s, %s, %s, %s)',
+                [(pk, stem_text(name), stem_text(description), stem_text(category))
+                 for pk, name, description, category in rows]
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D')) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [(pk, name or '', category or '', description or '')
+                 for pk, name, description, category in rows]
+            )
+
+    if cursor is not None:
+        run(cursor)
+    else:
+        with connection.cursor() as cursor:
+            run(cursor)
+
+
+def index_products(queryset):
+    """Переиндексирует товары из queryset"""
+    index_rows(queryset.values_list('id', 'name', 'description', 'category__name').iterator())
+
+
+def _table():
+    """Таблица индекса и ее столбец с id товара для текущей базы"""
+    if connection.vendor == 'sqlite':
+        return SQLITE_TABLE, 'rowid'
+    return POSTGRES_TABLE, 'product_id'
+
+
+def remove_product(product_id):
+    if not is_supported():
+        return
+    table, column = _table()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} = %s', [product_id])
+
+
+def clear_index():
+    if not is_supported():
+        return
+    table, _ = _table()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+
+
+def search_products(queryset, query):
+    """Фильтрует товары по поисковому запросу и сортирует по релевантности.
+
+    Каждое слово запроса ищется по началу (кирпич -> кирпичи), все слова
+    должны встретиться в названии, описании или категории товара.
+    Товары получают аннотацию search_rank.
+    """
+    terms = words(query)
+    if not terms:
+        return queryset.none()
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{stem(term)}"*' for term in terms)
+        matches = RawSQL(
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [match]
+        )
+        # bm25 тем меньше, чем лучше совпадение
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        rank = RawSQL(
+            f'SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} '
+            f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = shop_product.id', [match],
+            output_field=FloatField()
+        )
+    elif connection.vendor == 'postgresql':
+        # Слова уже без спецсимволов, поэтому их можно передать в to_tsquery
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(
+            f"SELECT product_id FROM {POSTGRES_TABLE} "
+            f"WHERE document @@ to_tsquery('{POSTGRES_CONFIG}', %s)", [tsquery]
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank_cd(document, to_tsquery('{POSTGRES_CONFIG}', %s)) "
+            f"FROM {POSTGRES_TABLE} WHERE product_id = shop_product.id", [tsquery],
+            output_field=FloatField()
+        )
+    else:
+        # Для остальных баз индекса нет - обычный поиск по подстроке
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        title_match = Q()
+        for term in terms:
+            title_match &= Q(name__icontains=term)
+        return queryset.filter(condition).annotate(search_rank=Case(
+            When(title_match, then=1.0), default=0.0, output_field=FloatField()
+        )).order_by('-search_rank', '-created_at')
+
+    return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Product
+from .models import Cart, Category, Product, Review
+from . import categories, ratings, search
+from .cart import merge_session_cart, store_summary
+from .cache import bump_catalog_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,3 +23,138 @@ def product_saved(sender, instance, created, **kwargs):
             logger.info(f"Товар {instance.name} сохранен без изображения")
     except Exception as e:
         logger.error(f"Ошибка при обработке товара: {e}")
+
+
+def _search_state(product):
+    """То, из чего собирается поисковый индекс товара"""
+    return product.name, product.description, product.category_id
+
+
+def _stored_search_state(product, update_fields=None):
+    """Индексируемые поля товара в базе до сохранения"""
+    if not product.pk:
+        return None
+    if update_fields is not None and not {'name', 'description', 'category'} & set(update_fields):
+        # Эти поля не сохраняются, индекс не изменится
+        return _search_state(product)
+    return Product.objects.filter(pk=product.pk).values_list('name', 'description', 'category_id').first()
+
+
+@receiver(pre_save, sender=Product)
+def remember_search_state(sender, instance, update_fields=None, **kwargs):
+    instance._previous_search_state = _stored_search_state(instance, update_fields)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Обновляет поисковый индекс товара"""
+    # Правка цены или остатка не меняет индексируемый текст
+    previous = getattr(instance, '_previous_search_state', None)
+    if previous is not None and previous == _search_state(instance):
+        return
+    search.index_products(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, update_fields=None, **kwargs):
+    """Запоминает название категории в базе до сохранения"""
+    if not instance.pk or (update_fields is not None and 'name' not in update_fields):
+        instance._previous_name = instance.name
+        return
+    instance._previous_name = Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    """Название категории входит в индекс ее товаров"""
+    if created or getattr(instance, '_previous_name', None) == instance.name:
+        return
+    search.index_products(Product.objects.filter(category=instance))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Любое изменение каталога делает закешированные страницы устаревшими.
+
+    Версия меняется после коммита: иначе параллельный запрос успел бы
+    закешировать старые данные под новой версией.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def _stored_review_state(review):
+    """Состояние отзыва в базе: объект в памяти мог устареть после update()"""
+    if not review.pk:
+        return None
+    return Review.objects.filter(pk=review.pk).values_list('approved', 'rating', 'product_id').first()
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, **kwargs):
+    """Запоминает прежнее состояние отзыва, чтобы обновить оценку товара на разницу"""
+    instance._previous_rating_state = _stored_review_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, **kwargs):
+    ratings.apply_change(getattr(instance, '_previous_rating_state', None), ratings.review_state(instance))
+
+
+@receiver(pre_delete, sender=Review)
+def remember_deleted_review_state(sender, instance, **kwargs):
+    instance._previous_rating_state = _stored_review_state(instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    ratings.apply_change(getattr(instance, '_previous_rating_state', None), None)
+
+
+def _stored_product_state(product, update_fields=None):
+    """Категория и доступность товара в базе до сохранения или удаления"""
+    if not product.pk:
+        return None
+    if update_fields is not None and not {'category', 'available'} & set(update_fields):
+        # Эти поля не сохраняются, счетчики не изменятся
+        return categories.product_state(product)
+    return Product.objects.filter(pk=product.pk).values_list('category_id', 'available').first()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, update_fields=None, **kwargs):
+    instance._previous_category_state = _stored_product_state(instance, update_fields)
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts_on_save(sender, instance, **kwargs):
+    categories.apply_change(
+        getattr(instance, '_previous_category_state', None), categories.product_state(instance)
+    )
+
+
+@receiver(pre_delete, sender=Product)
+def remember_deleted_product_state(sender, instance, **kwargs):
+    instance._previous_category_state = _stored_product_state(instance)
+
+
+@receiver(post_delete, sender=Product)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    categories.apply_change(getattr(instance, '_previous_category_state', None), None)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Переносит корзину из сессии в корзину пользователя и обновляет значок в шапке"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    cart = merge_session_cart(request.session, user)
+    if cart is None:
+        cart = Cart.objects.with_totals().filter(user=user).first()
+    store_summary(request.session, cart)
@@ -0,0 +1,66 @@
+from django import template
+from django.forms.utils import flatatt
+from django.urls import reverse
+from django.utils.html import format_html
+
+from shop.images import IMAGE_SLOTS, image_width, rendition_formats
+
+register = template.Library()
+
+
+def _widths(widths, source_width):
+    """Пары (ширина копии, настоящая ширина) для srcset.
+
+    thumbnail не увеличивает изображение, поэтому копии шире исходника
+    совпадают с ним: оставляем только первую из них (в том числе самую
+    маленькую ширину слота) и указываем для нее ширину исходника.
+    """
+    result = []
+    for width in sorted(widths):
+        if width >= source_width:
+            result.append((width, source_width))
+            break
+        result.append((width, width))
+    return result
+
+
+def _srcset(digest, widths, fmt):
+    return ', '.join(
+        f"{reverse('shop:image_rendition', kwargs={'digest': digest, 'width': width, 'fmt': fmt})} {actual}w"
+        for width, actual in widths
+    )
+
+
+@register.simple_tag
+def responsive_image(obj, slot='card', **attrs):
+    """Выводит изображение товара или категории в размере под место в шаблоне
+
+    Пример: {% responsive_image product 'card' class="card-img-top" alt=product.name %}
+    """
+    config = IMAGE_SLOTS[slot]
+    if config['lazy']:
+        attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    digest = obj.stored_image_id
+    source_width = image_width(digest) if digest else None
+    if source_width is None:
+        # Для изображений, которых нет в базе, остается обычный файл, а для тех,
+        # что Pillow не открывает (копий у них нет), - оригинал
+        url = obj.get_image_url()
+        if not url:
+            return ''
+        return format_html('<img src="{}"{}>', url, flatatt(attrs))
+
+    widths = _widths(config['widths'], source_width)
+    src = reverse('shop:image_rendition', kwargs={'digest': digest, 'width': widths[0][0], 'fmt': 'jpeg'})
+    img = format_html(
+        '<img src="{}" srcset="{}" sizes="{}"{}>',
+        src, _srcset(digest, widths, 'jpeg'), config['sizes'], flatatt(attrs),
+    )
+    if 'webp' not in rendition_formats():
+        return img
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>',
+        _srcset(digest, widths, 'webp'), config['sizes'], img,
+    )
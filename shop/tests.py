@@ -1,3 +1,124 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+
+from .models import Cart, Category, Order, OrderItem, Product
+from .orders import EmptyCart, OutOfStock, place_order
+
+ORDER_FIELDS = {'phone': '+996555000000', 'address': 'ул. Токтогула, 1', 'city': 'Бишкек'}
+
+
+def make_product(name='Тетрадь', stock=1, price='50.00'):
+    category, created = Category.objects.get_or_create(name='Канцелярия', slug='kantselyariya')
+    return Product.objects.create(category=category, name=name, slug=name, price=Decimal(price), stock=stock)
+
+
+def make_cart(username, *items):
+    user = User.objects.create_user(username, password='password')
+    cart = Cart.objects.create(user=user)
+    for product, quantity in items:
+        cart.add(product, quantity)
+    return cart
+
+
+class PlaceOrderTests(TestCase):
+    def test_order_decrements_stock_and_clears_cart(self):
+        notebook = make_product(stock=5)
+        pen = make_product('Ручка', stock=3, price='20.00')
+        cart = make_cart('buyer', (notebook, 2), (pen, 3))
+
+        order = place_order(cart.user, cart, **ORDER_FIELDS)
+
+        self.assertEqual(order.total_price, Decimal('160.00'))
+        self.assertEqual(
+            sorted(order.items.values_list('product__name', 'quantity', 'price')),
+            [('Ручка', 3, Decimal('20.00')), ('Тетрадь', 2, Decimal('50.00'))],
+        )
+        notebook.refresh_from_db()
+        pen.refresh_from_db()
+        self.assertEqual((notebook.stock, pen.stock), (3, 0))
+        self.assertFalse(cart.items.exists())
+
+    def test_empty_cart(self):
+        cart = make_cart('buyer')
+
+        with self.assertRaises(EmptyCart):
+            place_order(cart.user, cart, **ORDER_FIELDS)
+        self.assertFalse(Order.objects.exists())
+
+    def test_out_of_stock_changes_nothing(self):
+        notebook = make_product(stock=5)
+        pen = make_product('Ручка', stock=1, price='20.00')
+        cart = make_cart('buyer', (notebook, 2), (pen, 2))
+
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(cart.user, cart, **ORDER_FIELDS)
+
+        self.assertEqual(
+            [(product.pk, stock, available) for product, stock, available in raised.exception.shortages],
+            [(pen.pk, 1, True)],
+        )
+        notebook.refresh_from_db()
+        self.assertEqual(notebook.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 2)
+
+    def test_unavailable_product_reported(self):
+        notebook = make_product(stock=5)
+        Product.objects.filter(pk=notebook.pk).update(available=False)
+        cart = make_cart('buyer', (notebook, 1))
+
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(cart.user, cart, **ORDER_FIELDS)
+
+        self.assertEqual(str(raised.exception), 'Тетрадь (нет в продаже)')
+        self.assertFalse(Order.objects.exists())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Параллельные заказы не продают больше, чем есть на складе"""
+
+    buyers = 8
+    stock = 3
+
+    def test_no_overselling(self):
+        notebook = make_product(stock=self.stock)
+        carts = [make_cart(f'buyer{number}', (notebook, 1)) for number in range(self.buyers)]
+        start = threading.Barrier(self.buyers)
+        results = []
+
+        def buy(cart):
+            start.wait()
+            try:
+                for attempt in range(100):
+                    try:
+                        place_order(cart.user, cart, **ORDER_FIELDS)
+                    except OutOfStock:
+                        results.append('out of stock')
+                    except OperationalError:
+                        # SQLite в памяти не ждет блокировку таблицы, а сразу отказывает;
+                        # транзакция откатилась целиком, покупатель повторяет заказ
+                        time.sleep(0.01)
+                        continue
+                    else:
+                        results.append('ok')
+                    return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        notebook.refresh_from_db()
+        self.assertEqual(results.count('ok'), self.stock)
+        self.assertEqual(results.count('out of stock'), self.buyers - self.stock)
+        self.assertEqual(notebook.stock, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(sum(OrderItem.objects.values_list('quantity', flat=True)), self.stock)
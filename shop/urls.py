@@ -8,6 +8,8 @@ urlpatterns = [
     path('products/', views.ProductListView.as_view(), name='product_list'),
     path('product/<slug:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('category/<slug:slug>/', views.CategoryDetailView.as_view(), name='category_detail'),
+    path('images/<str:digest>/', views.image, name='image'),
+    path('images/<str:digest>/<int:width>.<str:fmt>', views.image_rendition, name='image_rendition'),
     path('cart/', views.cart_detail, name='cart_detail'),
     path('cart/add/<int:product_id>/', views.cart_add, name='cart_add'),
     path('cart/remove/<int:product_id>/', views.cart_remove, name='cart_remove'),
@@ -19,6 +21,11 @@ urlpatterns = [
     path('api/orders/<int:order_id>/generate-qr/', views.generate_qr_api, name='generate_qr_api'),
     path('api/orders/<int:order_id>/notify-payment/', views.notify_payment_api, name='notify_payment_api'),
     path('api/orders/<int:order_id>/change-payment/', views.change_payment_method_api, name='change_payment_method_api'),
+    path('api/products/', views.products_api, name='products_api'),
+    path('api/products/facets/', views.product_facets, name='product_facets'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/categories/', views.categories_api, name='categories_api'),
+    path('api/cart/', views.cart_api, name='cart_api'),
     path('search/', views.search, name='search'),
     path('add-review/<int:product_id>/', views.add_review, name='add_review'),
 ]
@@ -1,35 +1,51 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
-from django.core.paginator import Paginator
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.db.models import Count, Avg, Max
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, Http404
+from django.views.decorators.http import etag, require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView, CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import asyncio
+import json
 
-from .models import Product, Category, Cart, CartItem, Order, OrderItem, Review, BankAccount
+from .models import Product, Category, Order, Review, BankAccount
 from .forms import ProductFilterForm, ReviewForm, CartAddProductForm
-
-
+from .images import RENDITION_MIME_TYPES, load_image, load_rendition
+from .search import search_products
+from .fuzzy import fuzzy_products
+from .facets import facet_counts
+from .pagination import CursorPaginator
+from .cache import cache_anonymous_page, cached_catalog, catalog_version, conditional_page
+from .cart import get_cart, parse_changes, store_summary
+from .orders import EmptyCart, OutOfStock, place_order
+from .recommendations import recommended_products
+from .autocomplete import suggest
+from .categories import category_tree
+from .api import (
+    CATEGORY_FIELDS, DEFAULT_CATEGORY_FIELDS, DEFAULT_PRODUCT_FIELDS, PRODUCT_FIELDS,
+    catalog_etag, only_columns, parse_fields, serialize,
+)
+
+
+@cache_anonymous_page
 def home(request):
-    categories = Category.objects.annotate(product_count=Count('product'))[:6]
-    featured_products = Product.objects.filter(available=True)[:8]
-    new_products = Product.objects.filter(available=True).order_by('-created_at')[:8]
-    
-    context = {
-        'categories': categories,
-        'featured_products': featured_products,
-        'new_products': new_products,
-    }
+    # Подборки одинаковы для всех, поэтому строятся раз на версию каталога
+    context = cached_catalog('home', lambda: {
+        'categories': category_tree()[:6],
+        'featured_products': list(Product.objects.filter(available=True)[:8]),
+        'new_products': list(Product.objects.filter(available=True).order_by('-created_at')[:8]),
+    })
     return render(request, 'shop/home.html', context)
 
 
+@method_decorator(cache_anonymous_page, name='dispatch')
 class ProductListView(ListView):
     model = Product
     template_name = 'shop/product_list.html'
@@ -37,30 +53,181 @@ class ProductListView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = Product.objects.filter(available=True)
+        queryset = Product.objects.filter(available=True).with_category()
         
-        form = ProductFilterForm(self.request.GET)
-        if form.is_valid():
-            if form.cleaned_data['category']:
-                queryset = queryset.filter(category=form.cleaned_data['category'])
-            if form.cleaned_data['price_min']:
-                queryset = queryset.filter(price__gte=form.cleaned_data['price_min'])
-            if form.cleaned_data['price_max']:
-                queryset = queryset.filter(price__lte=form.cleaned_data['price_max'])
-            if form.cleaned_data['in_stock']:
-                queryset = queryset.filter(stock__gt=0)
-            if form.cleaned_data['sort_by']:
-                queryset = queryset.order_by(form.cleaned_data['sort_by'])
+        self.filter_form = ProductFilterForm(self.request.GET)
+        if self.filter_form.is_valid():
+            queryset = apply_product_filters(queryset, self.filter_form.cleaned_data)
+            if self.filter_form.cleaned_data['sort_by']:
+                queryset = queryset.order_by(self.filter_form.cleaned_data['sort_by'])
         
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        # Страницы по курсору: без COUNT(*) и OFFSET на каждой странице
+        page = CursorPaginator(queryset, page_size).get_page(
+            self.request.GET.get('cursor'), self.request.GET
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['filter_form'] = ProductFilterForm(self.request.GET)
-        context['categories'] = Category.objects.all()
+        context['filter_form'] = self.filter_form
+        context['categories'] = category_tree()
+        filters = self.filter_form.cleaned_data if self.filter_form.is_valid() else {}
+        facets = facet_counts(Product.objects.filter(available=True), filters)
+        # Ссылки фильтров сохраняют остальные выбранные параметры
+        for entry in facets['categories']:
+            entry['query'] = self.query_with(category=entry['id'])
+        for entry in facets['price_ranges']:
+            entry['query'] = self.query_with(price_min=entry['price_min'], price_max=entry['price_max'])
+        facets['in_stock_query'] = self.query_with(in_stock='on')
+        context['facets'] = facets
         return context
 
+    def query_with(self, **params):
+        query = self.request.GET.copy()
+        # Новый фильтр показывает результаты с начала
+        query.pop('cursor', None)
+        for key, value in params.items():
+            if value is None:
+                query.pop(key, None)
+            else:
+                query[key] = value
+        return query.urlencode()
+
+
+def apply_product_filters(queryset, filters):
+    """Применяет фильтры каталога из формы ProductFilterForm"""
+    if filters.get('category'):
+        queryset = queryset.filter(category=filters['category'])
+    if filters.get('price_min'):
+        queryset = queryset.filter(price__gte=filters['price_min'])
+    if filters.get('price_max'):
+        queryset = queryset.filter(price__lte=filters['price_max'])
+    if filters.get('in_stock'):
+        queryset = queryset.filter(stock__gt=0)
+    if filters.get('min_rating'):
+        queryset = queryset.filter(rating_avg__gte=filters['min_rating'])
+    return queryset
+
+
+def _api_error(error, errors):
+    return JsonResponse({'error': error, 'errors': errors}, status=400)
+
+
+def _api_limit(request, default=24):
+    try:
+        return min(max(int(request.GET.get('limit', default)), 1), 100)
+    except ValueError:
+        return default
+
+
+@etag(catalog_etag)
+def products_api(request):
+    """API: список товаров с фильтрами каталога и постраничным выводом по курсору.
+
+    fields - поля ответа через запятую; updated_since - только товары,
+    измененные с этого момента, включая снятые с продажи (для синхронизации).
+    """
+    form = ProductFilterForm(request.GET)
+    if not form.is_valid():
+        return _api_error('Некорректные параметры фильтра', form.errors.get_json_data())
+    try:
+        fields = parse_fields(request.GET.get('fields'), PRODUCT_FIELDS, DEFAULT_PRODUCT_FIELDS)
+    except ValueError as e:
+        return _api_error('Неизвестные поля', {'fields': e.args[0]})
+
+    updated_since = request.GET.get('updated_since')
+    if updated_since:
+        try:
+            updated_since = parse_datetime(updated_since)
+        except ValueError:
+            updated_since = None
+        if updated_since is None:
+            return _api_error('Некорректные параметры фильтра', {
+                'updated_since': ['Ожидается дата и время в формате ISO 8601']
+            })
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since)
+        # Изменения идут по порядку, чтобы клиент мог пройти их курсором до конца
+        queryset = Product.objects.filter(updated_at__gte=updated_since).order_by('updated_at', 'id')
+    else:
+        queryset = Product.objects.filter(available=True)
+
+    queryset = apply_product_filters(queryset, form.cleaned_data)
+    if form.cleaned_data['sort_by']:
+        queryset = queryset.order_by(form.cleaned_data['sort_by'])
+    if 'category' in fields:
+        queryset = queryset.with_category()
+
+    paginator = CursorPaginator(queryset, _api_limit(request))
+    # Читаем только нужные столбцы; поля сортировки нужны для курсора
+    paginator.queryset = queryset.only(*only_columns(
+        fields, PRODUCT_FIELDS, extra=[name for name, descending in paginator.fields]
+    ))
+    page = paginator.get_page(request.GET.get('cursor'))
+
+    return JsonResponse({
+        'results': serialize(page, fields, PRODUCT_FIELDS),
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@etag(catalog_etag)
+def categories_api(request):
+    """API: все категории; fields - поля ответа через запятую"""
+    try:
+        fields = parse_fields(request.GET.get('fields'), CATEGORY_FIELDS, DEFAULT_CATEGORY_FIELDS)
+    except ValueError as e:
+        return _api_error('Неизвестные поля', {'fields': e.args[0]})
+    return JsonResponse({'results': serialize(category_tree(), fields, CATEGORY_FIELDS)})
+
 
+def autocomplete(request):
+    """API: подсказки для строки поиска из индекса в памяти процесса"""
+    query = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    if not query:
+        return JsonResponse({'query': query, 'categories': [], 'products': []})
+    return JsonResponse({'query': query, **suggest(query, limit)})
+
+
+@etag(catalog_etag)
+def product_facets(request):
+    """API: количество товаров по значениям фильтров каталога"""
+    form = ProductFilterForm(request.GET)
+    if not form.is_valid():
+        return _api_error('Некорректные параметры фильтра', form.errors.get_json_data())
+    return JsonResponse(facet_counts(Product.objects.filter(available=True), form.cleaned_data))
+
+
+def product_page_state(request, slug):
+    """Изменения товара, его категории и отзывов - одним запросом.
+
+    На странице есть и другие товары (рекомендации, та же категория), поэтому
+    в ETag входит версия каталога: она меняется при любой правке товаров и
+    при пересчете рекомендаций.
+    """
+    rows = list(
+        Product.objects.filter(slug=slug).order_by()
+        .values_list('updated_at', 'category__updated_at')
+        .annotate(reviews_updated=Max('reviews__updated_at'), reviews=Count('reviews'))[:1]
+    )
+    if not rows:
+        return None
+    updated_at, category_updated_at, reviews_updated_at, reviews = rows[0]
+    last_modified = max(filter(None, [updated_at, category_updated_at, reviews_updated_at]))
+    # Число отзывов ловит удаление отзыва, после которого дата могла уменьшиться
+    return last_modified, [updated_at, category_updated_at, reviews_updated_at, reviews, catalog_version()]
+
+
+@method_decorator(conditional_page(product_page_state), name='dispatch')
+@method_decorator(cache_anonymous_page, name='dispatch')
 class ProductDetailView(DetailView):
     model = Product
     template_name = 'shop/product_detail.html'
@@ -70,14 +237,19 @@ class ProductDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         context['cart_product_form'] = CartAddProductForm()
         
-        # Получаем похожие товары из той же категории
-        context['related_products'] = Product.objects.filter(
+        # Товары, которые покупают вместе с этим; пока заказов нет - из той же категории
+        related = recommended_products(self.object, 4)
+        context['related_bought_together'] = bool(related)
+        context['related_products'] = related or Product.objects.filter(
             category=self.object.category,
             available=True
         ).exclude(id=self.object.id)[:4]
         
         # Получаем отзывы
-        context['reviews'] = self.object.reviews.filter(approved=True)
+        reviews = self.object.reviews.filter(approved=True).select_related('user')
+        context['reviews'] = CursorPaginator(reviews, 10).get_page(
+            self.request.GET.get('cursor'), self.request.GET
+        )
         context['review_form'] = ReviewForm()
         
         # Проверял ли пользователь товар
@@ -87,6 +259,21 @@ class ProductDetailView(DetailView):
         return context
 
 
+def category_page_state(request, slug):
+    """Изменения категории и ее товаров; добавление и удаление товара меняет саму категорию"""
+    rows = list(
+        Category.objects.filter(slug=slug).order_by()
+        .values_list('updated_at')
+        .annotate(products_updated=Max('product__updated_at'))[:1]
+    )
+    if not rows:
+        return None
+    updated_at, products_updated_at = rows[0]
+    return max(filter(None, [updated_at, products_updated_at])), [updated_at, products_updated_at]
+
+
+@method_decorator(conditional_page(category_page_state), name='dispatch')
+@method_decorator(cache_anonymous_page, name='dispatch')
 class CategoryDetailView(DetailView):
     model = Category
     template_name = 'shop/category_detail.html'
@@ -96,108 +283,160 @@ class CategoryDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         products = Product.objects.filter(category=self.object, available=True)
         
-        paginator = Paginator(products, 12)
-        page = self.request.GET.get('page')
-        context['products'] = paginator.get_page(page)
+        cursor = self.request.GET.get('cursor')
+        context['products'] = CursorPaginator(products, 12).get_page(cursor, self.request.GET)
+        # Общее количество показываем только на первой странице
+        if not cursor:
+            context['products_count'] = self.object.available_count
         
         return context
 
 
-def get_or_create_cart(request):
-    if request.user.is_authenticated:
-        cart, created = Cart.objects.get_or_create(user=request.user)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _immutable_response(request, etag, load):
+    """Ответ для неизменяемого ресурса: 304 по ETag или байты из load()"""
+    # URL меняется вместе с содержимым, поэтому совпадение ETag достаточно
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
     else:
-        session_key = request.session.session_key
-        if not session_key:
-            request.session.create()
-            session_key = request.session.session_key
-        cart, created = Cart.objects.get_or_create(session_key=session_key)
-    return cart
+        loaded = load()
+        if loaded is None:
+            raise Http404('Изображение не найдено')
+        data, content_type = loaded
+        response = HttpResponse(data, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def image(request, digest):
+    """Отдает изображение по хешу содержимого с бессрочным кешированием"""
+    return _immutable_response(request, f'"{digest}"', lambda: load_image(digest))
+
+
+def image_rendition(request, digest, width, fmt):
+    """Отдает уменьшенную копию изображения нужной ширины и формата"""
+    def load():
+        data = load_rendition(digest, width, fmt)
+        return (data, RENDITION_MIME_TYPES[fmt]) if data is not None else None
+
+    return _immutable_response(request, f'"{digest}-{width}-{fmt}"', load)
 
 
 def cart_detail(request):
-    cart = get_or_create_cart(request)
-    return render(request, 'shop/cart_detail.html', {'cart': cart})
+    cart = get_cart(request)
+    lines = cart.lines()
+    store_summary(request.session, cart)
+    return render(request, 'shop/cart_detail.html', {'cart': cart, 'lines': lines})
 
 
 @require_POST
 def cart_add(request, product_id):
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     form = CartAddProductForm(request.POST)
     
     if form.is_valid():
-        quantity = form.cleaned_data['quantity']
-        override = form.cleaned_data['override']
-        
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            if override:
-                cart_item.quantity = quantity
-            else:
-                cart_item.quantity += quantity
-            cart_item.save()
+        cart.add(product, form.cleaned_data['quantity'], override=form.cleaned_data['override'])
+        store_summary(request.session, cart)
     
     return redirect('shop:cart_detail')
 
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
-    CartItem.objects.filter(cart=cart, product=product).delete()
+    cart.remove(product)
+    store_summary(request.session, cart)
     return redirect('shop:cart_detail')
 
 
+@require_http_methods(['GET', 'POST'])
+def cart_api(request):
+    """JSON API корзины: GET - содержимое, POST - пачка изменений одним запросом.
+
+    POST {"items": [{"product": 12, "quantity": 3}, {"product": 7, "delta": -1}]}
+    """
+    cart = get_cart(request)
+    if request.method == 'GET':
+        lines = cart.lines()
+        count, total = store_summary(request.session, cart)
+        return JsonResponse({
+            'items': [
+                {'product': item.product_id, 'quantity': item.quantity, 'total_price': str(item.total_price)}
+                for item in lines
+            ],
+            'total_items': count,
+            'total_price': format(total, '.2f'),
+        })
+
+    try:
+        changes = parse_changes(json.loads(request.body))
+    except json.JSONDecodeError:
+        return _api_error('Некорректный JSON', {})
+    except ValueError as e:
+        return _api_error('Некорректные изменения корзины', e.args[0])
+
+    prices = dict(Product.objects.filter(pk__in=list(changes)).values_list('pk', 'price'))
+    unknown = [pk for pk in changes if pk not in prices]
+    if unknown:
+        return _api_error('Товары не найдены', {'products': unknown})
+
+    quantities = cart.update(changes)
+    count, total = store_summary(request.session, cart)
+    return JsonResponse({
+        'items': [
+            {'product': pk, 'quantity': quantity, 'total_price': str(prices[pk] * quantity)}
+            for pk, quantity in quantities.items()
+        ],
+        'total_items': count,
+        'total_price': format(total, '.2f'),
+    })
+
+
 @login_required
 def checkout(request):
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
+    lines = cart.lines()
     
-    if not cart.items.exists():
+    if not lines:
         messages.error(request, 'Ваша корзина пуста')
         return redirect('shop:cart_detail')
     
     if request.method == 'POST':
-        # Создание заказа
-        payment_method = request.POST.get('payment_method', 'qr_code')
-        order = Order.objects.create(
-            user=request.user,
-            first_name=request.user.first_name,
-            last_name=request.user.last_name,
-            email=request.user.email,
-            phone=request.POST.get('phone'),
-            address=request.POST.get('address'),
-            city=request.POST.get('city'),
-            postal_code=request.POST.get('postal_code', ''),
-            total_price=cart.total_price,
-            payment_method=payment_method
-        )
-        
-        # Создаем элементы заказа
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
+        # Создание заказа: позиции, списание остатков и очистка корзины - одной транзакцией
+        try:
+            order = place_order(
+                request.user, cart,
+                first_name=request.user.first_name,
+                last_name=request.user.last_name,
+                email=request.user.email,
+                phone=request.POST.get('phone'),
+                address=request.POST.get('address'),
+                city=request.POST.get('city'),
+                postal_code=request.POST.get('postal_code', ''),
+                payment_method=request.POST.get('payment_method', 'qr_code'),
             )
+        except EmptyCart:
+            messages.error(request, 'Ваша корзина пуста')
+            return redirect('shop:cart_detail')
+        except OutOfStock as e:
+            messages.error(request, f'Не все товары можно заказать: {e}')
+            return redirect('shop:cart_detail')
         
         # Генерируем QR-код для заказа
         order.generate_qr_code()
         
-        # Очищаем корзину
-        cart.items.all().delete()
+        store_summary(request.session, None)
         
         # Перенаправляем на страницу QR-оплаты
         messages.success(request, f'Заказ #{order.id} успешно оформлен!')
         return redirect('shop:qr_payment', order_id=order.id)
     
-    return render(request, 'shop/checkout.html', {'cart': cart})
+    return render(request, 'shop/checkout.html', {'cart': cart, 'lines': lines})
 
 
 @login_required
@@ -232,21 +471,22 @@ def add_review(request, product_id):
 
 def search(request):
     query = request.GET.get('q')
-    results = []
+    products = []
+    fuzzy = False
     
     if query:
-        results = Product.objects.filter(
-            Q(name__icontains=query) | Q(description__icontains=query),
-            available=True
-        )
-    
-    paginator = Paginator(results, 12)
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+        # Поиск по индексу с сортировкой по релевантности
+        results = search_products(Product.objects.filter(available=True), query).with_category()
+        if not results.exists():
+            # Ничего не нашлось - возможно, опечатка или другая раскладка
+            results = fuzzy_products(Product.objects.filter(available=True), query).with_category()
+            fuzzy = True
+        products = CursorPaginator(results, 12).get_page(request.GET.get('cursor'), request.GET)
     
     return render(request, 'shop/search.html', {
         'products': products,
-        'query': query
+        'query': query,
+        'fuzzy': fuzzy,
     })
 
 
@@ -237,7 +237,7 @@ function initSearch() {
         
         searchTimeout = setTimeout(() => {
             performSearch(query);
-        }, 300);
+        }, 150);
     });
     
     // Hide search results when clicking outside
@@ -248,37 +248,58 @@ function initSearch() {
     });
 }
 
+let lastSearchQuery = '';
+
 function performSearch(query) {
-    apiCall(`/api/search?q=${encodeURIComponent(query)}`)
+    const form = document.querySelector('.search-container');
+    const url = form ? form.dataset.autocompleteUrl : '/api/autocomplete/';
+    lastSearchQuery = query;
+    apiCall(`${url}?q=${encodeURIComponent(query)}`)
         .then(data => {
-            showSearchResults(data.results);
+            // Ответ на устаревший запрос не показываем
+            if (data.query === lastSearchQuery) {
+                showSearchResults(data);
+            }
         })
         .catch(error => {
             console.error('Search failed:', error);
         });
 }
 
-function showSearchResults(results) {
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function showSearchResults(data) {
     const container = document.getElementById('searchResults');
     if (!container) return;
     
-    if (results.length === 0) {
+    const categories = data.categories.map(category => `
+        <a href="${category.url}" class="search-result-item d-block p-2 text-decoration-none">
+            <i class="fas fa-folder text-muted me-2"></i>${escapeHtml(category.name)}
+        </a>
+    `);
+    const products = data.products.map(product => `
+        <a href="${product.url}" class="search-result-item d-flex align-items-center p-2 text-decoration-none">
+            ${product.image_url ? 
+                `<img src="${product.image_url}" alt="" style="width: 40px; height: 40px; object-fit: cover;">` :
+                `<div class="bg-light d-flex align-items-center justify-content-center" style="width: 40px; height: 40px;">
+                    <i class="fas fa-image text-muted"></i>
+                </div>`
+            }
+            <div class="ms-3">
+                <div class="fw-bold">${escapeHtml(product.name)}</div>
+                <small class="text-muted">${product.price} сом</small>
+            </div>
+        </a>
+    `);
+    
+    if (categories.length + products.length === 0) {
         container.innerHTML = '<div class="p-3 text-muted">Ничего не найдено</div>';
     } else {
-        container.innerHTML = results.map(product => `
-            <a href="/product/${product.slug}" class="search-result-item d-flex align-items-center p-2 text-decoration-none">
-                ${product.image_url ? 
-                    `<img src="${product.image_url}" alt="${product.name}" style="width: 40px; height: 40px; object-fit: cover;">` :
-                    `<div class="bg-light d-flex align-items-center justify-content-center" style="width: 40px; height: 40px;">
-                        <i class="fas fa-image text-muted"></i>
-                    </div>`
-                }
-                <div class="ms-3">
-                    <div class="fw-bold">${product.name}</div>
-                    <small class="text-muted">${formatPrice(product.price)}</small>
-                </div>
-            </a>
-        `).join('');
+        container.innerHTML = categories.concat(products).join('');
     }
     
     container.style.display = 'block';
@@ -316,6 +337,78 @@ function smoothScroll(target) {
     });
 }
 
+// Корзина: шаги количества копятся и уходят одним запросом к API корзины
+function initCartSteppers() {
+    const container = document.getElementById('cartLines');
+    if (!container) return;
+
+    const pending = {};
+    let flushTimeout;
+
+    function schedule(productId, quantity) {
+        pending[productId] = quantity;
+        clearTimeout(flushTimeout);
+        flushTimeout = setTimeout(flush, 300);
+    }
+
+    function flush() {
+        const items = Object.entries(pending).map(([product, quantity]) => ({
+            product: Number(product),
+            quantity: quantity
+        }));
+        Object.keys(pending).forEach(product => delete pending[product]);
+        if (!items.length) return;
+
+        apiCall(container.dataset.cartApiUrl, {
+            method: 'POST',
+            body: JSON.stringify({items: items})
+        })
+            .then(updateCart)
+            .catch(() => showError('Не удалось обновить корзину'));
+    }
+
+    function updateCart(data) {
+        data.items.forEach(item => {
+            const line = container.querySelector(`.cart-item[data-product-id="${item.product}"]`);
+            if (!line) return;
+            line.querySelector('.cart-line-total').textContent = item.total_price;
+        });
+        document.querySelectorAll('.cart-total-price').forEach(element => {
+            element.textContent = data.total_price;
+        });
+        const badge = document.getElementById('cartBadge');
+        if (badge) {
+            badge.textContent = data.total_items;
+            badge.title = `${data.total_price} сом`;
+            badge.classList.toggle('d-none', !data.total_items);
+        }
+    }
+
+    container.querySelectorAll('.cart-item').forEach(line => {
+        const productId = line.dataset.productId;
+        const input = line.querySelector('.cart-quantity');
+        const form = line.querySelector('.cart-quantity-form');
+
+        function setQuantity(value) {
+            const max = Number(input.max) || Infinity;
+            const quantity = Math.min(Math.max(value, 1), max);
+            input.value = quantity;
+            schedule(productId, quantity);
+        }
+
+        line.querySelectorAll('.cart-step').forEach(button => {
+            button.addEventListener('click', () => {
+                setQuantity((parseInt(input.value, 10) || 1) + Number(button.dataset.delta));
+            });
+        });
+        input.addEventListener('change', () => setQuantity(parseInt(input.value, 10) || 1));
+        form.addEventListener('submit', e => {
+            e.preventDefault();
+            setQuantity(parseInt(input.value, 10) || 1);
+        });
+    });
+}
+
 // Export functions for use in templates
 window.cart = cart;
 window.formatPrice = formatPrice;
@@ -327,11 +420,13 @@ window.previewImage = previewImage;
 window.confirmAction = confirmAction;
 window.apiCall = apiCall;
 window.initSearch = initSearch;
+window.initCartSteppers = initCartSteppers;
 window.smoothScroll = smoothScroll;
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
     initSearch();
     initLazyLoading();
+    initCartSteppers();
     cart.updateUI();
 });